@@ -1,28 +1,197 @@
-import whisper
 import sys
 import re
 import os
+from concurrent.futures import ThreadPoolExecutor
+import transcribe_service
+import transcribe_backends
+import transcript_cache
+import audio_processing
 
-# Load model once
-try:
-    model = whisper.load_model("base")
-except Exception as e:
-    print(f"Model loading error: {e}")
-    model = None
+# --- CHUNKED MODE ---
+# Long dictations are split on pauses and the chunks transcribed concurrently
+# by the shared service or by this process's one loaded model - never by
+# extra model copies (VERBAPOST_CHUNK_WORKERS, default 2)
+CHUNKED_MIN_SECONDS = 90
+CHUNK_SECONDS = 30
+CHUNK_WORKERS = transcribe_backends.CHUNK_WORKERS
 
-def transcribe_audio(filename):
-    if model is None:
-        return "Error: AI Model not loaded."
+# UI language names -> Whisper language codes
+LANGUAGE_CODES = {
+    "English": "en",
+    "Japanese": "ja",
+    "Chinese": "zh",
+    "Korean": "ko",
+}
+
+# Trim/compress silence and normalize loudness before the model sees the audio
+PREPROCESS = True
+
+def get_backend(tier=None):
+    """Local engine for a tier. Loaded on first use, only when the shared service can't be used."""
+    try:
+        return transcribe_backends.get_backend(model_size=transcribe_backends.model_size_for_tier(tier))
+    except Exception as e:
+        print(f"Model loading error: {e}")
+        return None
+
+def whisper_options(language=None, task="transcribe"):
+    """
+    Decoding options for a UI language. Passing the language skips Whisper's
+    detection pass; unknown or missing languages fall back to auto-detect.
+    """
+    options = {"task": task}
+    code = LANGUAGE_CODES.get(language, language if language in LANGUAGE_CODES.values() else None)
+    if code:
+        options["language"] = code
+    return options
+
+def transcribe_audio(audio, tier=None, language=None, task="transcribe"):
+    """
+    Transcribes a recording given as a path, raw encoded bytes, a file-like
+    buffer or a 16 kHz mono NumPy array. Decoding happens in-process.
+    language is the UI name ("Japanese") or a Whisper code ("ja").
+    """
+    label = audio if isinstance(audio, str) else type(audio).__name__
+    print(f"🎧 Transcribing {label}...")
+    backend_name = transcribe_backends.DEFAULT_BACKEND
+    model_size = transcribe_backends.model_size_for_tier(tier)
+
+    # Identical audio (replays, retries after a UI error) never hits Whisper twice
+    options = whisper_options(language, task)
+    cache_key = transcript_cache.make_key(
+        audio_processing.fingerprint(audio), f"{backend_name}:{model_size}",
+        options.get("language"), task=task, preprocess=PREPROCESS
+    )
+    cached = transcript_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    samples = audio_processing.load_audio(audio)
+    if PREPROCESS:
+        samples, report = audio_processing.preprocess(samples)
+        print(f"✂️ Removed {report['removed_seconds']}s of {report['input_seconds']}s (gain {report['gain_db']} dB)")
+
+    text = _run_transcription(samples, tier, options)
+    if text is not None:
+        transcript_cache.put(cache_key, text)
+        return text
+    return "Error: AI Model not loaded."
+
+def _run_transcription(samples, tier=None, options=None):
+    options = options or {}
+    model_size = transcribe_backends.model_size_for_tier(tier)
+    long_audio = CHUNK_WORKERS > 1 and len(samples) > CHUNKED_MIN_SECONDS * audio_processing.SAMPLE_RATE
+
+    # Prefer the host-wide service so the model is loaded once per machine
+    service_matches = (transcribe_backends.DEFAULT_BACKEND == "whisper"
+                       and model_size == transcribe_service.MODEL_NAME)
+    if service_matches and transcribe_service.is_available():
+        try:
+            if long_audio:
+                # Chunks arrive together, so the service decodes them as one batch
+                return transcribe_chunked(samples, transcribe=transcribe_service.transcribe, **options)
+            return transcribe_service.transcribe(samples, **options)
+        except (ConnectionError, transcribe_service.ServiceError) as e:
+            print(f"⚠️ {e} - falling back to local model")
+
+    backend = get_backend(tier)
+    if backend is None:
+        return None
+
+    # openai-whisper serializes calls on one model, so chunking it gains nothing
+    if long_audio and backend.concurrent:
+        return transcribe_chunked(samples, transcribe=backend.transcribe, **options)
         
-    print(f"🎧 Transcribing {filename}...")
-    result = model.transcribe(filename)
-    return result["text"]
-
-def polish_text(text):
-    fillers = ["um", "uh", "ah", "like, you know", "you know"]
-    polished = text
-    for filler in fillers:
-        pattern = re.compile(re.escape(filler), re.IGNORECASE)
-        polished = pattern.sub("", polished)
+    return backend.transcribe(samples, **options)
+
+# ==========================================
+#  CHUNKED TRANSCRIPTION
+# ==========================================
+def transcribe_chunked(audio, transcribe=None, workers=CHUNK_WORKERS, chunk_seconds=CHUNK_SECONDS, **options):
+    """
+    Splits 16 kHz mono audio on voice-activity pauses, runs up to `workers`
+    chunks at a time through `transcribe` (default: this process's
+    backend) and stitches the text back in order.
+    Accepts anything audio_processing.load_audio does.
+    """
+    audio = audio_processing.load_audio(audio)
+    transcribe = transcribe or get_backend().transcribe
+
+    bounds = audio_processing.split_on_silence(audio, max_chunk_seconds=chunk_seconds)
+    chunks = [audio[start:end] for start, end in bounds]
+    print(f"✂️ Transcribing {len(chunks)} chunks, {workers} at a time...")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as pool:
+        texts = list(pool.map(lambda chunk: transcribe(chunk, **options), chunks))
+    return " ".join(t.strip() for t in texts if t.strip())
+
+# ==========================================
+#  TEXT POLISHING
+# ==========================================
+# Spoken fillers per language
+FILLERS = {
+    # "you know" is only a filler when set off by commas ("Do you know where...?" is a question)
+    "en": ["um", "umm", "uh", "uhh", "ah", "er", "erm", ", like, you know,", ", you know,"],
+    "ja": ["えーと", "えっと", "えー", "あのー"],
+    "zh": ["嗯", "呃"],
+    "ko": ["음", "으음", "어어"],
+}
+# Legitimate doubled words that must survive repeat collapsing ("had had")
+ALLOWED_REPEATS = {"had", "that", "very", "no", "so", "really", "bye", "ha", "well"}
+# Characters a filler must not touch. Japanese and Chinese are written
+# without spaces, so their fillers sit directly against the next word.
+_WORD_CHARS = {"ja": None, "zh": None, "ko": r"\uac00-\ud7a3"}
+
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*|[^\w\s]")
+# Letters only: "Room 11 11" or "4 4" are not stutters
+_REPEAT_RE = re.compile(r"\b([^\W\d_]+)\s+\1\b(?:\s+\1\b)*", re.IGNORECASE)
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([,.!?;:、。，！？])")
+# Commas left orphaned by a removed filler: "was, , going" / "agree, ."
+_STRAY_COMMA_RE = re.compile(r"[,、，](?=\s*[,.!?;:、。，！？])")
+
+def _compile_fillers(phrases, word_chars=r"\w"):
+    """
+    One precompiled pattern per language. Each phrase is tokenized so that
+    multi-word fillers tolerate any spacing, and a phrase that starts or
+    ends on a word may not touch `word_chars` there (None: no boundary).
+    Matching is case-sensitive - "um" or a sentence-initial "Um", but
+    never the abbreviation "ER". Longest phrases come first so
+    ", like, you know," wins over ", you know,".
+    """
+    before = f"(?<![{word_chars}])" if word_chars else ""
+    after = f"(?![{word_chars}])" if word_chars else ""
+    alternatives = []
+    for phrase in sorted(phrases, key=len, reverse=True):
+        for tokens in {tuple(_TOKEN_RE.findall(phrase)), tuple(_TOKEN_RE.findall(phrase.capitalize()))}:
+            parts = [before if tokens[0][0].isalnum() else "", re.escape(tokens[0])]
+            for prev, token in zip(tokens, tokens[1:]):
+                # words need real whitespace between them; punctuation may hug either side
+                parts.append(r"\s+" if prev[0].isalnum() and token[0].isalnum() else r"\s*")
+                parts.append(re.escape(token))
+            parts.append(after if tokens[-1][0].isalnum() else "")
+            alternatives.append("".join(parts))
+    return re.compile("|".join(alternatives))
+
+_FILLER_PATTERNS = {code: _compile_fillers(words, _WORD_CHARS.get(code, r"\w")) for code, words in FILLERS.items()}
+
+def _collapse_repeat(match):
+    word = match.group(1)
+    return match.group(0) if word.lower() in ALLOWED_REPEATS else word
+
+def polish_text(text, language="English"):
+    """
+    Removes spoken fillers and accidental repeated words ("I I think").
+    Fillers match whole tokens only, so "um" never matches inside "umbrella"
+    and "ah" never inside "Utah".
+    """
+    code = LANGUAGE_CODES.get(language, language)
+    pattern = _FILLER_PATTERNS.get(code, _FILLER_PATTERNS["en"])
+    # Unspaced scripts close up around the filler instead of gaining a space
+    polished = pattern.sub("" if code in _WORD_CHARS and not _WORD_CHARS[code] else " ", text)
+    polished = _REPEAT_RE.sub(_collapse_repeat, polished)
     polished = " ".join(polished.split())
-    return polished
+    polished = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", polished)
+    return _STRAY_COMMA_RE.sub("", polished).lstrip(",、， ")
+
+def polish_texts(texts, language="English"):
+    """Batch form of polish_text; the lexicon is compiled once at import."""
+    return [polish_text(t, language) for t in texts]
@@ -0,0 +1,246 @@
+import hashlib
+import io
+import os
+import subprocess
+import wave
+import numpy as np
+
+# Whisper's native input format
+SAMPLE_RATE = 16000
+
+# ==========================================
+#  DECODING
+# ==========================================
+def _as_file(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb"), True
+    source.seek(0)
+    return source, False
+
+def fingerprint(source, chunk_size=1 << 20):
+    """sha256 of the encoded audio (bytes, path, file-like or NumPy array)."""
+    digest = hashlib.sha256()
+    if isinstance(source, np.ndarray):
+        digest.update(np.ascontiguousarray(source).tobytes())
+        return digest.hexdigest()
+    f, owned = _as_file(source)
+    try:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    finally:
+        if owned:
+            f.close()
+        else:
+            f.seek(0)
+    return digest.hexdigest()
+
+def to_mono(audio):
+    """(samples, channels) -> (samples,) by averaging channels."""
+    if audio.ndim == 1:
+        return audio
+    return audio.mean(axis=1, dtype=np.float32)
+
+def resample(audio, sr, target_sr=SAMPLE_RATE):
+    if sr == target_sr or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly
+        g = gcd(int(sr), int(target_sr))
+        return resample_poly(audio, target_sr // g, sr // g).astype(np.float32)
+    except ImportError:
+        n_out = int(round(len(audio) * target_sr / sr))
+        positions = np.arange(n_out, dtype=np.float64) * (sr / target_sr)
+        return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+def _decode_wav(f):
+    """PCM WAV -> (float32 samples, channels), sample rate. Raises wave.Error otherwise."""
+    with wave.open(f, "rb") as w:
+        channels, width, sr = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        audio = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16))
+        ints = np.where(ints & 0x800000, ints - (1 << 24), ints)
+        audio = ints.astype(np.float32) / (1 << 23)
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        raise wave.Error(f"Unsupported sample width: {width}")
+    return audio.reshape(-1, channels), sr
+
+def _decode_ffmpeg(f):
+    """Any container ffmpeg understands, piped through memory (no temp file)."""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+           "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+    # Real files are piped by descriptor; in-memory buffers are written to stdin
+    if isinstance(f, (io.FileIO, io.BufferedReader, io.BufferedRandom)):
+        out = subprocess.run(cmd, stdin=f.fileno(), capture_output=True, check=True).stdout
+    else:
+        out = subprocess.run(cmd, input=f.read(), capture_output=True, check=True).stdout
+    return np.frombuffer(out, dtype="<i2").astype(np.float32) / 32768
+
+def load_audio(source, sr=SAMPLE_RATE):
+    """
+    Decodes bytes, a path, a file-like object or a NumPy array to float32
+    mono at the model rate. WAV (what st.audio_input records) is decoded
+    in-process; anything else goes through an ffmpeg pipe.
+    A NumPy array is taken as samples at `sr`.
+    """
+    if isinstance(source, np.ndarray):
+        return resample(to_mono(source.astype(np.float32, copy=False)), sr)
+
+    f, owned = _as_file(source)
+    try:
+        try:
+            audio, file_sr = _decode_wav(f)
+            return resample(to_mono(audio), file_sr)
+        except (wave.Error, EOFError):
+            f.seek(0)
+            return _decode_ffmpeg(f)
+    finally:
+        if owned:
+            f.close()
+
+# --- VOICE ACTIVITY ---
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.3
+SILENCE_FLOOR_DB = -45.0
+
+def frame_energy_db(audio, sr=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """RMS level (dBFS) of consecutive non-overlapping frames."""
+    frame_len = max(1, int(sr * frame_seconds))
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), frame_len
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return (20 * np.log10(np.maximum(rms, 1e-10))).astype(np.float32), frame_len
+
+def voiced_mask(audio, sr=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """
+    Boolean per-frame speech mask.
+    Threshold adapts to the recording: halfway between the noise floor and the
+    speech level, but never below SILENCE_FLOOR_DB.
+    """
+    db, frame_len = frame_energy_db(audio, sr, frame_seconds)
+    if len(db) == 0:
+        return np.zeros(0, dtype=bool), frame_len
+    noise, speech = np.percentile(db, 10), np.percentile(db, 90)
+    threshold = max(SILENCE_FLOOR_DB, (noise + speech) / 2)
+    return db > threshold, frame_len
+
+def silence_runs(mask, min_frames):
+    """(start_frame, end_frame) of unvoiced runs at least min_frames long."""
+    if len(mask) == 0:
+        return []
+    padded = np.concatenate(([True], mask, [True]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]  # voiced->silent, silent->voiced
+    keep = (ends - starts) >= min_frames
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+def split_on_silence(audio, sr=SAMPLE_RATE, max_chunk_seconds=30.0, min_chunk_seconds=5.0):
+    """
+    Splits audio into chunks no longer than max_chunk_seconds, cutting in the
+    middle of the latest substantial pause available. Falls back to a hard cut when a
+    stretch has no pause at all. Returns a list of sample-index (start, end).
+    """
+    total = len(audio)
+    max_len = int(max_chunk_seconds * sr)
+    if total <= max_len:
+        return [(0, total)]
+
+    mask, frame_len = voiced_mask(audio, sr)
+    min_frames = max(1, int(MIN_SILENCE_SECONDS / FRAME_SECONDS))
+    # Cut candidates: midpoint of each pause, weighted by pause length
+    runs = silence_runs(mask, min_frames)
+    cut_points = np.array([(s + e) // 2 * frame_len for s, e in runs], dtype=np.int64)
+    cut_weights = np.array([e - s for s, e in runs], dtype=np.int64)
+
+    chunks = []
+    start = 0
+    min_len = int(min_chunk_seconds * sr)
+    while total - start > max_len:
+        window = (cut_points >= start + min_len) & (cut_points <= start + max_len)
+        if window.any():
+            candidates = np.flatnonzero(window)
+            # Latest pause that is at least half as long as the longest one in reach
+            weights = cut_weights[candidates]
+            good = candidates[weights * 2 >= weights.max()]
+            cut = int(cut_points[good[-1]])
+        else:
+            cut = start + max_len
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, total))
+    return chunks
+
+# ==========================================
+#  PREPROCESSING
+# ==========================================
+EDGE_PAD_SECONDS = 0.2     # speech padding kept around voiced regions
+MAX_PAUSE_SECONDS = 0.6    # longer pauses are shortened to this
+TARGET_DBFS = -20.0        # loudness of voiced audio after normalization
+MAX_GAIN_DB = 30.0
+
+def preprocess(audio, sr=SAMPLE_RATE):
+    """
+    Prepares a recording for the model: downmix, resample to SAMPLE_RATE,
+    trim leading/trailing silence, shorten long pauses and normalize loudness.
+    Returns (audio, report) where report says how much audio was removed.
+    """
+    audio = resample(to_mono(np.asarray(audio, dtype=np.float32)), sr)
+    input_seconds = len(audio) / SAMPLE_RATE
+    report = {"input_seconds": round(input_seconds, 2), "output_seconds": round(input_seconds, 2),
+              "removed_seconds": 0.0, "gain_db": 0.0}
+
+    mask, frame_len = voiced_mask(audio)
+    if not mask.any():
+        return audio, report  # nothing recognisable as speech; leave it for the model to judge
+
+    # Leading/trailing silence goes except for a little padding next to speech;
+    # interior pauses up to MAX_PAUSE_SECONDS stay, longer ones keep their two ends
+    pad = int(EDGE_PAD_SECONDS / FRAME_SECONDS)
+    max_frames = int(MAX_PAUSE_SECONDS / FRAME_SECONDS)
+    keep = mask.copy()
+    for start, end in silence_runs(mask, 1):
+        if start == 0:
+            keep[max(end - pad, 0):end] = True
+        elif end == len(mask):
+            keep[start:start + pad] = True
+        elif end - start <= max_frames:
+            keep[start:end] = True
+        else:
+            keep[start:start + max_frames // 2] = True
+            keep[end - (max_frames - max_frames // 2):end] = True
+
+    sample_keep = np.repeat(keep, frame_len)
+    tail = len(audio) - len(sample_keep)
+    if tail:
+        sample_keep = np.concatenate((sample_keep, np.full(tail, keep[-1])))
+    trimmed = audio[sample_keep]
+
+    # Loudness: bring voiced RMS to TARGET_DBFS without clipping
+    voiced = np.repeat(mask, frame_len)
+    voiced_samples = audio[:len(voiced)][voiced]
+    rms = np.sqrt(np.mean(np.square(voiced_samples, dtype=np.float64)))
+    gain_db = min(MAX_GAIN_DB, TARGET_DBFS - 20 * np.log10(max(rms, 1e-10)))
+    peak = float(np.max(np.abs(trimmed))) if len(trimmed) else 0.0
+    if peak > 0:
+        gain_db = min(gain_db, 20 * np.log10(0.99 / peak))
+    trimmed = (trimmed * np.float32(10 ** (gain_db / 20))).astype(np.float32)
+
+    output_seconds = len(trimmed) / SAMPLE_RATE
+    report.update({
+        "output_seconds": round(output_seconds, 2),
+        "removed_seconds": round(input_seconds - output_seconds, 2),
+        "gain_db": round(float(gain_db), 1),
+    })
+    return trimmed, report
@@ -0,0 +1,104 @@
+"""
+Compare transcription backends on a fixed local corpus.
+
+Corpus layout: a directory of clips with reference transcripts next to them
+    corpus/letter_01.wav  corpus/letter_01.txt  ...
+
+Usage: python bench_backends.py corpus/ [backend:size ...]
+       python bench_backends.py corpus/ whisper:base faster-whisper:base faster-whisper:small
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation.
+Reports real-time factor (processing seconds per audio second), peak RSS and
+word error rate against the references.
+"""
+import glob
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_CONFIGS = ["whisper:base", "faster-whisper:base"]
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over words, one row at a time
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        row = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = row
+    return prev[-1] / len(ref)
+
+def load_corpus(corpus_dir):
+    pairs = []
+    for audio_path in sorted(glob.glob(os.path.join(corpus_dir, "*.wav"))):
+        ref_path = os.path.splitext(audio_path)[0] + ".txt"
+        if os.path.exists(ref_path):
+            with open(ref_path, encoding="utf-8") as f:
+                pairs.append((audio_path, f.read()))
+    return pairs
+
+def run_worker(config, corpus_dir):
+    """Runs inside the subprocess: one backend, whole corpus."""
+    import transcribe_backends
+    name, size = config.split(":")
+    load_start = time.perf_counter()
+    backend = transcribe_backends.BACKENDS[name](size)
+    load_seconds = time.perf_counter() - load_start
+
+    audio_seconds = busy_seconds = errors = ref_words = 0.0
+    for audio_path, reference in load_corpus(corpus_dir):
+        audio = backend.load_audio(audio_path)
+        audio_seconds += len(audio) / transcribe_backends.SAMPLE_RATE
+        start = time.perf_counter()
+        text = backend.transcribe(audio)
+        busy_seconds += time.perf_counter() - start
+        n = len(normalize_words(reference))
+        errors += word_error_rate(reference, text) * n
+        ref_words += n
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    print(json.dumps({
+        "config": config,
+        "load_s": round(load_seconds, 2),
+        "audio_s": round(audio_seconds, 1),
+        "rtf": round(busy_seconds / audio_seconds, 3) if audio_seconds else None,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "wer": round(errors / ref_words, 4) if ref_words else None,
+    }))
+
+def main(corpus_dir, configs):
+    if not load_corpus(corpus_dir):
+        print(f"❌ No .wav/.txt pairs found in {corpus_dir}")
+        sys.exit(1)
+
+    print(f"{'backend':<28}{'load s':>8}{'RTF':>8}{'peak RSS MB':>13}{'WER':>8}")
+    for config in configs:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", config, corpus_dir],
+            capture_output=True, text=True
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"{config:<28}❌ {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+            continue
+        r = json.loads(lines[-1])
+        print(f"{config:<28}{r['load_s']:>8}{r['rtf']:>8}{r['peak_rss_mb']:>13}{r['wer']:>8}")
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 2:
+        main(sys.argv[1], sys.argv[2:] or DEFAULT_CONFIGS)
+    else:
+        print(__doc__)
+        sys.exit(1)
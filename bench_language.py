@@ -0,0 +1,36 @@
+"""
+Per-clip latency with Whisper language auto-detection vs. the locked language.
+
+Usage: python bench_language.py English=en.wav Japanese=ja.wav Chinese=zh.wav Korean=ko.wav [runs]
+"""
+import sys
+import time
+import ai_engine
+import audio_processing
+
+def timed(backend, audio, runs, **options):
+    best = float("inf")
+    text = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        text = backend.transcribe(audio, **options)
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+def bench(clips, runs):
+    backend = ai_engine.get_backend()
+    print(f"{'language':<10}{'auto s':>9}{'locked s':>10}{'saved ms':>10}")
+    for language, path in clips:
+        audio = audio_processing.load_audio(path)
+        backend.transcribe(audio[:audio_processing.SAMPLE_RATE])  # warm-up
+        auto, _ = timed(backend, audio, runs, task="transcribe")
+        locked, _ = timed(backend, audio, runs, **ai_engine.whisper_options(language))
+        print(f"{language:<10}{auto:>9.2f}{locked:>10.2f}{(auto - locked) * 1000:>10.0f}")
+
+if __name__ == "__main__":
+    clips = [tuple(arg.split("=", 1)) for arg in sys.argv[1:] if "=" in arg]
+    runs = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    if not clips:
+        print(__doc__)
+        sys.exit(1)
+    bench(clips, runs[0] if runs else 3)
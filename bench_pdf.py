@@ -0,0 +1,48 @@
+"""
+PDFs per second from letter_format.create_pdf, with and without the font registry.
+
+Usage: python bench_pdf.py [letters_per_run]
+
+The CJK run needs the Noto CJK collection at letter_format.CJK_PATH
+(apt: fonts-noto-cjk) and is skipped when it is missing.
+"""
+import os
+import sys
+import time
+import font_registry
+import letter_format
+
+SAMPLES = {
+    "English": "Dear Grandma, thank you for the lovely sweater. " * 30,
+    "Japanese": "おばあちゃんへ、素敵なセーターをありがとう。" * 30,
+}
+
+def run(language, count):
+    start = time.perf_counter()
+    for i in range(count):
+        letter_format.create_pdf(
+            SAMPLES[language], "Jane Doe\n1 Main St\nNashville, TN 37201", "John Doe\n2 Oak Ave",
+            False, language, f"bench_{i}.pdf"
+        )
+    return count / (time.perf_counter() - start)
+
+def bench(count):
+    letter_format.preflight()
+    languages = ["English"]
+    if os.path.exists(letter_format.CJK_PATH):
+        languages.append("Japanese")
+    else:
+        print(f"⚠️ {letter_format.CJK_PATH} not found - skipping CJK")
+
+    print(f"{'language':<10}{'before PDF/s':>14}{'after PDF/s':>13}{'speedup':>9}")
+    for language in languages:
+        font_registry.ENABLED = False
+        before = run(language, count)
+        font_registry.ENABLED = True
+        run(language, 1)  # first document pays the one-time parse
+        after = run(language, count)
+        print(f"{language:<10}{before:>14.2f}{after:>13.2f}{after / before:>8.2f}x")
+    print(font_registry.get_stats())
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
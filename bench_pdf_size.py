@@ -0,0 +1,83 @@
+"""
+Output size and render time of letter_format.create_pdf for English and CJK letters.
+
+Usage: python bench_pdf_size.py [letters_per_run]
+
+Prints total bytes, how much of that is embedded font data, the size of
+the font files the letter would embed without subsetting, and ms/render.
+The CJK run needs the Noto CJK collection at letter_format.CJK_PATH
+(apt: fonts-noto-cjk) and is skipped when it is missing.
+"""
+import os
+import re
+import sys
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+import letter_format
+import signature_image
+
+SAMPLES = {
+    "English": "Dear Grandma, thank you for the lovely sweater. " * 30,
+    "Japanese": "おばあちゃんへ、素敵なセーターをありがとう。" * 30,
+}
+
+# Embedded font programs carry /Length1 (TrueType) or /Subtype /CIDFontType0C (CFF)
+_STREAM_RE = re.compile(rb"<<((?:[^<>]|<<[^<>]*>>)*)>>\s*stream")
+_LENGTH_RE = re.compile(rb"/Length (\d+)")
+
+def sample_signature():
+    img = Image.new("RGBA", (350, 200), (255, 255, 255, 255))
+    ImageDraw.Draw(img).line([(60, 120), (120, 80), (200, 130), (280, 90)], fill=(0, 0, 0, 255), width=2)
+    return signature_image.compact(np.array(img))
+
+def breakdown(pdf_bytes):
+    """Bytes of embedded font programs, images and everything else."""
+    fonts = images = 0
+    for match in _STREAM_RE.finditer(pdf_bytes):
+        header = match.group(1)
+        length = int(_LENGTH_RE.search(header).group(1))
+        if b"/Length1" in header or b"/CIDFontType0C" in header or b"/OpenType" in header:
+            fonts += length
+        elif b"/Image" in header:
+            images += length
+    return {"fonts": fonts, "images": images, "other": len(pdf_bytes) - fonts - images}
+
+def source_font_bytes(language):
+    """What embedding the full font files would cost."""
+    fonts = letter_format.available_fonts()
+    roles = ["cjk"] if language in ["Japanese", "Chinese", "Korean"] and "cjk" in fonts else ["hand", "sans"]
+    total = 0
+    for entry in letter_format.FONT_MANIFEST:
+        if entry["role"] in roles and fonts.get(entry["role"]) == entry["name"]:
+            total += os.path.getsize(letter_format.font_path(entry))
+    return total
+
+def bench(count):
+    letter_format.preflight()
+    signature = sample_signature()
+    languages = ["English"]
+    if os.path.exists(letter_format.CJK_PATH):
+        languages.append("Japanese")
+    else:
+        print(f"⚠️ {letter_format.CJK_PATH} not found - skipping CJK")
+
+    print(f"{'language':<10}{'PDF bytes':>11}{'fonts':>9}{'images':>8}{'other':>8}{'full fonts':>12}{'ms/PDF':>9}")
+    for language in languages:
+        def render():
+            return letter_format.create_pdf(
+                SAMPLES[language], "Jane Doe\n1 Main St\nNashville, TN 37201", "John Doe\n2 Oak Ave",
+                False, language, signature=signature, as_bytes=True
+            )
+        pdf_bytes = render()  # warm the font registry
+        start = time.perf_counter()
+        for _ in range(count):
+            render()
+        ms = (time.perf_counter() - start) / count * 1000
+        parts = breakdown(pdf_bytes)
+        print(f"{language:<10}{len(pdf_bytes):>11}{parts['fonts']:>9}{parts['images']:>8}{parts['other']:>8}"
+              f"{source_font_bytes(language):>12}{ms:>9.1f}")
+    print(letter_format.get_size_stats())
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,58 @@
+"""
+Throughput of ai_engine.polish_text against the original regex-per-filler loop.
+
+Usage: python bench_polish.py [words_per_transcript] [transcripts]
+"""
+import random
+import re
+import sys
+import time
+import ai_engine
+
+def legacy_polish_text(text):
+    fillers = ["um", "uh", "ah", "like, you know", "you know"]
+    polished = text
+    for filler in fillers:
+        pattern = re.compile(re.escape(filler), re.IGNORECASE)
+        polished = pattern.sub("", polished)
+    polished = " ".join(polished.split())
+    return polished
+
+VOCAB = ("dear grandma I wanted to write and say thank you for the umbrella "
+         "we visited Utah last summer and the kids loved it").split()
+FILLER_WORDS = ["um,", "uh", "you know,", "like, you know,"]
+
+def make_transcript(words, rng):
+    out = []
+    for _ in range(words):
+        out.append(rng.choice(FILLER_WORDS) if rng.random() < 0.08 else rng.choice(VOCAB))
+    return " ".join(out) + "."
+
+def bench(words, count):
+    rng = random.Random(42)
+    texts = [make_transcript(words, rng) for _ in range(count)]
+    total_words = words * count
+
+    start = time.perf_counter()
+    for t in texts:
+        legacy_polish_text(t)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ai_engine.polish_texts(texts)
+    current = time.perf_counter() - start
+
+    vocab = {w.lower() for w in VOCAB}
+
+    # Words the old substring matching corrupts ("umbrella" -> "brella", "Utah" -> "Ut")
+    def damaged(polish):
+        return sum(1 for t in texts[:20] for w in polish(t).replace(",", " ").replace(".", " ").split()
+                   if w.lower() not in vocab)
+
+    print(f"{count} transcripts x {words} words")
+    print(f"legacy : {legacy:.3f}s ({total_words / legacy:,.0f} words/s), {damaged(legacy_polish_text)} damaged words in sample")
+    print(f"current: {current:.3f}s ({total_words / current:,.0f} words/s), {damaged(ai_engine.polish_text)} damaged words in sample")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    bench(args[0] if args else 2000, args[1] if len(args) > 1 else 200)
@@ -0,0 +1,35 @@
+"""
+Wall-clock benchmark: single-call Whisper vs. VAD-chunked concurrent mode
+(one shared model; set VERBAPOST_TRANSCRIBE_BACKEND=faster-whisper).
+
+Usage: python bench_transcribe.py long_dictation.wav [workers]
+"""
+import os
+import sys
+import time
+import ai_engine
+import audio_processing
+
+def bench(audio_file, workers):
+    backend = ai_engine.get_backend()
+    audio = backend.load_audio(audio_file)
+    duration = len(audio) / audio_processing.SAMPLE_RATE
+    print(f"🎧 {audio_file}: {duration:.1f}s of audio, {os.cpu_count()} cores")
+
+    start = time.perf_counter()
+    single_text = backend.transcribe(audio)
+    single = time.perf_counter() - start
+    print(f"Single call: {single:.2f}s (RTF {single / duration:.3f})")
+
+    start = time.perf_counter()
+    chunked_text = ai_engine.transcribe_chunked(audio, transcribe=backend.transcribe, workers=workers)
+    chunked = time.perf_counter() - start
+    print(f"Chunked x{workers}: {chunked:.2f}s (RTF {chunked / duration:.3f})")
+    print(f"Speedup: {single / chunked:.2f}x")
+    print(f"Words: single={len(single_text.split())} chunked={len(chunked_text.split())}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    bench(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else ai_engine.CHUNK_WORKERS)
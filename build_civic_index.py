@@ -0,0 +1,101 @@
+"""
+Build-time compiler for the offline civic index (see civic_index.py).
+
+Inputs:
+  --zcta-cd      Census ZCTA <-> congressional district relationship file
+                 (pipe or comma delimited, with GEOID_ZCTA5_* and GEOID_CD*
+                 columns; the CD GEOID is state FIPS + district number)
+  --legislators  legislators-current.csv from the congress-legislators project
+
+Both accept a local path or a URL. Re-run after redistricting or when the
+membership of Congress changes, then deploy the resulting civic_index.bin.
+
+Usage: python build_civic_index.py --zcta-cd FILE --legislators FILE [--out civic_index.bin]
+"""
+import argparse
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import date
+import requests
+import civic_index
+
+LEGISLATORS_URL = "https://unitedstates.github.io/congress-legislators/legislators-current.csv"
+
+STATE_FIPS = {
+    "01": "AL", "02": "AK", "04": "AZ", "05": "AR", "06": "CA", "08": "CO", "09": "CT", "10": "DE",
+    "11": "DC", "12": "FL", "13": "GA", "15": "HI", "16": "ID", "17": "IL", "18": "IN", "19": "IA",
+    "20": "KS", "21": "KY", "22": "LA", "23": "ME", "24": "MD", "25": "MA", "26": "MI", "27": "MN",
+    "28": "MS", "29": "MO", "30": "MT", "31": "NE", "32": "NV", "33": "NH", "34": "NJ", "35": "NM",
+    "36": "NY", "37": "NC", "38": "ND", "39": "OH", "40": "OK", "41": "OR", "42": "PA", "44": "RI",
+    "45": "SC", "46": "SD", "47": "TN", "48": "TX", "49": "UT", "50": "VT", "51": "VA", "53": "WA",
+    "54": "WV", "55": "WI", "56": "WY", "72": "PR",
+}
+
+def read_text(source):
+    if re.match(r"https?://", source):
+        r = requests.get(source, timeout=60)
+        r.raise_for_status()
+        return r.content.decode("utf-8-sig")
+    with open(source, encoding="utf-8-sig") as f:
+        return f.read()
+
+def district_name(state, number):
+    # At-large seats and non-voting delegates (Census district 98) are "-00"
+    number = int(number)
+    return f"{state}-{0 if number in (0, 98) else number:02d}"
+
+def parse_zcta_cd(text):
+    delimiter = "|" if "|" in text.splitlines()[0] else ","
+    rows = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    zcta_col = next(c for c in rows.fieldnames if c.upper().startswith("GEOID_ZCTA5"))
+    cd_col = next(c for c in rows.fieldnames if c.upper().startswith("GEOID_CD"))
+
+    zip_districts = defaultdict(set)
+    for row in rows:
+        zcta, cd = (row[zcta_col] or "").strip(), (row[cd_col] or "").strip()
+        if len(zcta) != 5 or len(cd) != 4 or not cd[2:].isdigit():
+            continue  # unassigned / water parts
+        state = STATE_FIPS.get(cd[:2])
+        if state:
+            zip_districts[zcta].add(district_name(state, cd[2:]))
+    return {z: sorted(ds) for z, ds in zip_districts.items()}
+
+def _target(row):
+    """Same shape as civic_engine targets."""
+    senator = row["type"] == "sen"
+    full_name = f"{row['first_name']} {row['last_name']}"
+    return {
+        'name': full_name,
+        'title': "U.S. Senator" if senator else "U.S. Representative",
+        'address_obj': civic_index.capitol_address(full_name, row.get("address"), senator)
+    }
+
+def parse_legislators(text):
+    reps, senators = defaultdict(list), defaultdict(list)
+    for row in csv.DictReader(io.StringIO(text)):
+        if row["type"] == "sen":
+            senators[row["state"]].append(_target(row))
+        elif row["type"] == "rep" and row.get("district", "").strip().isdigit():
+            reps[district_name(row["state"], row["district"])].append(_target(row))
+    return dict(reps), dict(senators)
+
+def build(zcta_cd, legislators, out):
+    zip_districts = parse_zcta_cd(read_text(zcta_cd))
+    reps, senators = parse_legislators(read_text(legislators))
+    source = {"zcta_cd": zcta_cd, "legislators": legislators, "built": date.today().isoformat()}
+    civic_index.write(out, zip_districts, reps, senators, source)
+
+    index = civic_index.Index(out)
+    single = sum(1 for z in index.zips if index.reps_for(f"{z:05d}"))
+    print(f"✅ {out}: {len(index.zips)} ZIPs, {len(index.district_names)} districts, "
+          f"{single} ZIPs resolve offline ({len(index.zips) - single} need Geocodio)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--zcta-cd", required=True)
+    parser.add_argument("--legislators", default=LEGISLATORS_URL)
+    parser.add_argument("--out", default=civic_index.INDEX_PATH)
+    args = parser.parse_args()
+    build(args.zcta_cd, args.legislators, args.out)
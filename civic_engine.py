@@ -1,5 +1,13 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
 import requests
 import streamlit as st
+import civic_index
+import database
+import mailer
 
 # Load Key
 try:
@@ -7,80 +15,210 @@ try:
 except:
     API_KEY = None
 
-def get_reps(address):
-    if not API_KEY:
-        st.error("❌ Configuration Error: Geocodio API Key is missing.")
-        return []
+# --- CONFIG ---
+GEOCODIO_URL = "https://api.geocod.io/v1.7/geocode"
+REQUEST_TIMEOUT = (3, 10)      # connect, read (seconds)
+MEMORY_ENTRIES = 1024
+CACHE_TTL = 90 * 24 * 3600     # districts change at redistricting, legislators at elections
+CACHE_VERSION = 2              # bump when the cached target shape changes
+
+_ZIP_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\s*$")
+
+_memory = OrderedDict()  # key -> (expires_at, targets)
+_lock = threading.Lock()
+_stats = {"offline_hits": 0, "offline_ambiguous": 0, "memory_hits": 0, "db_hits": 0, "api_calls": 0, "zip_fallbacks": 0, "misses": 0}
+_session = None
 
-    url = "https://api.geocod.io/v1.7/geocode"
-    params = {
-        'q': address,
+def _get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+    return _session
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+def _cache_get(key):
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry and entry[0] > now:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            # Callers get their own copy; the cached list stays as fetched
+            return copy.deepcopy(entry[1])
+    try:
+        targets = database.get_civic_cache(key)
+    except Exception as e:
+        print(f"Civic cache read failed: {e}")
+        targets = None
+    if targets is not None:
+        _count("db_hits")
+        _remember(key, targets)
+    return targets
+
+def _remember(key, targets):
+    targets = copy.deepcopy(targets)
+    with _lock:
+        _memory[key] = (time.time() + CACHE_TTL, targets)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+def _cache_put(key, targets):
+    _remember(key, targets)
+    try:
+        database.put_civic_cache(key, targets, CACHE_TTL)
+    except Exception as e:
+        print(f"Civic cache write failed: {e}")
+
+def _address_key(address):
+    # "street, city, state zip": USPS abbreviations apply to the street part only
+    street, _, rest = (address or "").partition(",")
+    rest = " ".join(rest.upper().replace(",", " ").split())
+    return f"v{CACHE_VERSION}:addr:{mailer.normalize_street(street)}, {rest}"
+
+def _geocode(query):
+    """First Geocodio result for query (with congressional districts), or None. Raises on API errors."""
+    _count("api_calls")
+    r = _get_session().get(GEOCODIO_URL, params={
+        'q': query,
         'fields': 'cd', # Congressional District
         'api_key': API_KEY
-    }
+    }, timeout=REQUEST_TIMEOUT)
+    data = r.json()
+    if "error" in data:
+        raise RuntimeError(f"Geocodio Error: {data['error']}")
+    results = data.get('results')
+    return results[0] if results else None
 
-    try:
-        r = requests.get(url, params=params)
-        data = r.json()
+def _parse_targets(districts):
+    targets = []
+    for district in districts:
+        legislators = district.get('current_legislators', [])
 
-        if "error" in data:
-            st.error(f"❌ Geocodio Error: {data['error']}")
-            return []
+        for leg in legislators:
+            role = leg.get('type', 'unknown')
+            title = "U.S. Senator" if role == 'senator' else "U.S. Representative"
 
-        if not data.get('results'):
-            st.warning("⚠️ Address not found.")
-            return []
+            # SAFE NAME PARSING (The Fix)
+            first = leg.get('bio', {}).get('first_name') or leg.get('first_name', 'Unknown')
+            last = leg.get('bio', {}).get('last_name') or leg.get('last_name', 'Official')
+            full_name = f"{first} {last}"
+
+            # Safe Address Parsing: split the one-line office address into street + ZIP
+            contact = leg.get('contact', {})
+            clean_address = civic_index.capitol_address(full_name, contact.get('address'), role == 'senator')
+
+            # Deduplicate
+            is_duplicate = False
+            for t in targets:
+                if t['name'] == clean_address['name']:
+                    is_duplicate = True
 
-        result = data['results'][0]
-        targets = []
-        
-        # Parse Congressional Data safely
-        districts = result.get('fields', {}).get('congressional_districts', [])
-        
-        for district in districts:
-            legislators = district.get('current_legislators', [])
-            
-            for leg in legislators:
-                role = leg.get('type', 'unknown')
-                title = "U.S. Senator" if role == 'senator' else "U.S. Representative"
-                
-                # SAFE NAME PARSING (The Fix)
-                first = leg.get('bio', {}).get('first_name') or leg.get('first_name', 'Unknown')
-                last = leg.get('bio', {}).get('last_name') or leg.get('last_name', 'Official')
-                full_name = f"{first} {last}"
-                
-                # Safe Address Parsing
-                contact = leg.get('contact', {})
-                addr_raw = contact.get('address')
-                if not addr_raw:
-                    addr_raw = 'United States Capitol, Washington DC 20510'
-
-                clean_address = {
+            if not is_duplicate:
+                targets.append({
                     'name': full_name,
-                    'street': addr_raw,
-                    'city': "Washington",
-                    'state': "DC",
-                    'zip': "20510"
-                }
-
-                # Deduplicate
-                is_duplicate = False
-                for t in targets:
-                    if t['name'] == clean_address['name']:
-                        is_duplicate = True
-                
-                if not is_duplicate:
-                    targets.append({
-                        'name': full_name,
-                        'title': title,
-                        'address_obj': clean_address
-                    })
-
-        if len(targets) == 0:
-            st.warning("⚠️ Location found, but no legislators listed.")
-        
+                    'title': title,
+                    'address_obj': clean_address
+                })
+    return targets
+
+def _zip_targets(zip_code):
+    """
+    Representatives by ZIP alone. A ZIP spanning several districts only
+    yields its (state-wide) senators - guessing the House member would
+    mail the wrong office.
+    """
+    index = civic_index.get_index()
+    districts = index.districts_for(zip_code) if index is not None else []
+    if districts:
+        states = sorted({d.split("-")[0] for d in districts})
+        return [t for state in states for t in index.senators_for(state)]
+
+    key = f"v{CACHE_VERSION}:zip:{zip_code}"
+    targets = _cache_get(key)
+    if targets is not None:
         return targets
+    if not API_KEY:
+        raise RuntimeError("Geocodio API Key is missing.")
+    result = _geocode(zip_code)
+    if not result:
+        return []
+    districts = result.get('fields', {}).get('congressional_districts', [])
+    targets = _parse_targets(districts)
+    if len(districts) > 1:
+        targets = [t for t in targets if t['title'] == "U.S. Senator"]
+    _cache_put(key, targets)
+    return targets
+
+def get_reps(address):
+    """
+    Federal legislators for a one-line US address. Single-district ZIPs
+    resolve from the offline index (civic_index); otherwise served from
+    the in-process LRU, then the database cache (keyed by the normalized
+    address), then Geocodio; if the address can't be resolved, falls
+    back to the ZIP.
+    """
+    zip_match = _ZIP_RE.search(address or "")
+    index = civic_index.get_index()
+    if index is not None and zip_match:
+        targets = index.reps_for(zip_match.group(1))
+        if targets:
+            _count("offline_hits")
+            return targets
+        if len(index.districts_for(zip_match.group(1))) > 1:
+            _count("offline_ambiguous")
 
+    key = _address_key(address)
+    targets = _cache_get(key)
+    if targets is not None:
+        return targets
+    _count("misses")
+
+    if not API_KEY:
+        # The offline index can still answer for the ZIP (senators of an ambiguous one)
+        if not zip_match:
+            st.error("❌ Configuration Error: Geocodio API Key is missing.")
+            return []
+    else:
+        try:
+            result = _geocode(address)
+            if result:
+                targets = _parse_targets(result.get('fields', {}).get('congressional_districts', []))
+                if targets:
+                    _cache_put(key, targets)
+                    return targets
+                st.warning("⚠️ Location found, but no legislators listed.")
+                return []
+            if not zip_match:
+                st.warning("⚠️ Address not found.")
+                return []
+        except Exception as e:
+            if not zip_match:
+                st.error(f"❌ Civic Engine Error: {e}")
+                return []
+            print(f"Address lookup failed, trying ZIP: {e}")
+
+    # ZIP-level fallback
+    _count("zip_fallbacks")
+    try:
+        targets = _zip_targets(zip_match.group(1))
     except Exception as e:
         st.error(f"❌ Civic Engine Error: {e}")
-        return []
\ No newline at end of file
+        return []
+    if not targets:
+        st.warning("⚠️ Address not found.")
+    return targets
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    hits = stats["offline_hits"] + stats["memory_hits"] + stats["db_hits"]
+    lookups = hits + stats["misses"]
+    stats["hit_rate"] = round(hits / lookups, 3) if lookups else None
+    index = civic_index.get_index()
+    stats["offline_index"] = index.stats() if index is not None else None
+    return stats
@@ -0,0 +1,155 @@
+"""
+Offline ZIP -> congressional district -> legislator index.
+
+Compiled at build time by build_civic_index.py and memory-mapped at
+runtime, so a lookup is a binary search over a shared read-only array
+instead of a Geocodio round-trip.
+
+File layout (little-endian):
+    header      MAGIC, n_zips, n_pairs, meta_offset, meta_len
+    zips        uint32[n_zips]      sorted ZIP codes
+    starts      uint32[n_zips + 1]  offsets into districts per ZIP
+    districts   uint16[n_pairs]     indexes into meta["districts"]
+    meta        JSON: districts ("TN-05"), reps by district, senators by state
+"""
+import copy
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import numpy as np
+
+MAGIC = b"VPCIDX01"
+HEADER = struct.Struct("<8sQQQQ")
+INDEX_PATH = os.environ.get(
+    "VERBAPOST_CIVIC_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "civic_index.bin")
+)
+
+_CAPITOL_RE = re.compile(r"^(.*?),?\s+Washington,?\s+DC\s+(\d{5})(?:-\d{4})?\s*$", re.IGNORECASE)
+
+_index = None
+_loaded = False
+_lock = threading.Lock()
+
+def _align(offset, to=8):
+    return -(-offset // to) * to
+
+def write(path, zip_districts, reps, senators, source=None):
+    """
+    zip_districts: {"37201": ["TN-05"], ...}
+    reps:          {"TN-05": [target, ...]}  (civic_engine target dicts)
+    senators:      {"TN": [target, ...]}
+    """
+    districts = sorted({d for ds in zip_districts.values() for d in ds})
+    district_ids = {d: i for i, d in enumerate(districts)}
+    zips = sorted(zip_districts, key=int)
+
+    keys = np.array([int(z) for z in zips], dtype="<u4")
+    counts = [len(zip_districts[z]) for z in zips]
+    starts = np.zeros(len(zips) + 1, dtype="<u4")
+    starts[1:] = np.cumsum(counts)
+    pairs = np.array([district_ids[d] for z in zips for d in sorted(zip_districts[z])], dtype="<u2")
+    meta = json.dumps({"districts": districts, "reps": reps, "senators": senators, "source": source or {}}).encode("utf-8")
+
+    offset = HEADER.size
+    blobs = []
+    for array in (keys, starts, pairs):
+        offset = _align(offset)
+        blobs.append((offset, array.tobytes()))
+        offset += array.nbytes
+    meta_offset = _align(offset)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(zips), len(pairs), meta_offset, len(meta)))
+        for blob_offset, blob in blobs + [(meta_offset, meta)]:
+            f.write(b"\0" * (blob_offset - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+def capitol_address(name, raw, senator):
+    """
+    Mailing address for a legislator's DC office. `raw` is a one-line
+    contact address ("2458 Rayburn House Office Building Washington DC
+    20515"); the street and ZIP are split out of it, and the ZIP defaults
+    to the chamber's (20510 Senate, 20515 House).
+    """
+    street, zip_code = (raw or "").strip(), "20510" if senator else "20515"
+    match = _CAPITOL_RE.match(street)
+    if match:
+        street, zip_code = match.group(1), match.group(2)
+    return {
+        'name': name,
+        'street': street or 'United States Capitol',
+        'city': "Washington",
+        'state': "DC",
+        'zip': zip_code
+    }
+
+class Index:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_zips, n_pairs, meta_offset, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a civic index")
+
+        offset = _align(HEADER.size)
+        self.zips = np.frombuffer(self._mm, dtype="<u4", count=n_zips, offset=offset)
+        offset = _align(offset + self.zips.nbytes)
+        self.starts = np.frombuffer(self._mm, dtype="<u4", count=n_zips + 1, offset=offset)
+        offset = _align(offset + self.starts.nbytes)
+        self.pairs = np.frombuffer(self._mm, dtype="<u2", count=n_pairs, offset=offset)
+
+        meta = json.loads(self._mm[meta_offset:meta_offset + meta_len])
+        self.district_names = meta["districts"]
+        self.reps = meta["reps"]
+        self.senators = meta["senators"]
+        self.source = meta["source"]
+
+    def districts_for(self, zip_code):
+        """Every district the ZIP overlaps ([] if unknown)."""
+        try:
+            key = int(str(zip_code)[:5])
+        except ValueError:
+            return []
+        i = int(np.searchsorted(self.zips, key))
+        if i == len(self.zips) or self.zips[i] != key:
+            return []
+        return [self.district_names[d] for d in self.pairs[self.starts[i]:self.starts[i + 1]]]
+
+    def reps_for(self, zip_code):
+        """
+        Senators + House member for a single-district ZIP; None if unknown or
+        ambiguous. Returns copies: callers may edit them without touching
+        the shared index.
+        """
+        districts = self.districts_for(zip_code)
+        if len(districts) != 1:
+            return None
+        district = districts[0]
+        targets = self.senators.get(district.split("-")[0], []) + self.reps.get(district, [])
+        return copy.deepcopy(targets) or None
+
+    def senators_for(self, state):
+        """A state's senators (copies, like reps_for)."""
+        return copy.deepcopy(self.senators.get(state, []))
+
+    def stats(self):
+        return {"zips": len(self.zips), "districts": len(self.district_names), "source": self.source}
+
+def get_index():
+    """The process-wide index, or None if no index file is installed."""
+    global _index, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                try:
+                    _index = Index(INDEX_PATH) if os.path.exists(INDEX_PATH) else None
+                except Exception as e:
+                    print(f"❌ Civic index {INDEX_PATH} unusable: {e}")
+                    _index = None
+                _loaded = True
+    return _index
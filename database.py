@@ -1,20 +1,110 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, joinedload
-from datetime import datetime
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, LargeBinary, Index, func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, scoped_session, joinedload, defer
+from sqlalchemy.pool import QueuePool
+from datetime import datetime, timedelta
+import json
+import threading
+import time
 import streamlit as st
 from sqlalchemy.engine import Engine
 
 Base = declarative_base()
 
-def get_engine() -> Engine:
+# --- CONNECTION POOL ---
+# One engine (and one pool) per process. Tunable from secrets:
+# [connections] pool_size / max_overflow / pool_recycle / pool_timeout / pool_pre_ping
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 1800,
+    "pool_timeout": 30,
+    "pool_pre_ping": True,
+}
+
+_engine = None
+_session_factory = None
+_engine_lock = threading.RLock()
+
+_wait_lock = threading.Lock()
+_wait_stats = {"checkouts": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to get a connection."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with _wait_lock:
+                _wait_stats["checkouts"] += 1
+                _wait_stats["total_wait"] += waited
+                _wait_stats["max_wait"] = max(_wait_stats["max_wait"], waited)
+
+_TRUE, _FALSE = ("1", "true", "yes", "on"), ("0", "false", "no", "off")
+
+def _pool_config(conn_secrets):
+    """Pool settings from [connections], over POOL_DEFAULTS. Raises ValueError on a bad value."""
+    config = dict(POOL_DEFAULTS)
+    for key, default in POOL_DEFAULTS.items():
+        if key not in conn_secrets:
+            continue
+        value = conn_secrets[key]
+        text = str(value).strip().lower()
+        if isinstance(default, bool) and text in _TRUE + _FALSE:
+            config[key] = text in _TRUE
+            continue
+        if not isinstance(default, bool):
+            try:
+                config[key] = type(default)(value)
+                continue
+            except (TypeError, ValueError):
+                pass
+        raise ValueError(f"[connections] {key} = {value!r} is not a valid {type(default).__name__}")
+    return config
+
+def _build_engine() -> Engine:
     try:
-        db_url = st.secrets["connections"]["database_url"]
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        return create_engine(db_url)
-    except:
+        conn_secrets = st.secrets["connections"]
+        db_url = conn_secrets["database_url"]
+    except (KeyError, FileNotFoundError) as e:
+        # No database configured (local development): use a SQLite file
+        print(f"⚠️ No [connections] database_url ({e!r}); using sqlite:///verbapost.db")
         return create_engine('sqlite:///verbapost.db')
 
+    # Misconfiguration must fail loudly, never fall back to SQLite in production
+    config = _pool_config(conn_secrets)
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+    return create_engine(db_url, poolclass=TimedQueuePool, **config)
+
+def get_engine() -> Engine:
+    """Returns the process-wide engine, building it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine()
+    return _engine
+
+def get_pool_stats():
+    """Snapshot of pool usage for sizing against the number of app workers."""
+    pool = get_engine().pool
+    with _wait_lock:
+        checkouts = _wait_stats["checkouts"]
+        avg_wait = _wait_stats["total_wait"] / checkouts if checkouts else 0.0
+        max_wait = _wait_stats["max_wait"]
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        "checkouts": checkouts,
+        "avg_wait_ms": round(avg_wait * 1000, 2),
+        "max_wait_ms": round(max_wait * 1000, 2),
+    }
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
@@ -43,11 +133,57 @@ class Letter(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
     author = relationship("User", back_populates="letters")
 
+    # Admin queue: WHERE status = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index('ix_letters_status_created_at', 'status', 'created_at', 'id'),
+    )
+
+class OutboxMail(Base):
+    """A letter waiting to be (or already) handed to Lob; drained by mail_outbox."""
+    __tablename__ = 'mail_outbox'
+    id = Column(Integer, primary_key=True)
+    letter_id = Column(Integer, ForeignKey('letters.id'), nullable=True)
+    idempotency_key = Column(String, unique=True, nullable=False)
+    pdf = Column(LargeBinary, nullable=False)
+    to_address = Column(Text, nullable=False)    # JSON
+    from_address = Column(Text, nullable=False)  # JSON
+    status = Column(String, default="pending")   # pending -> sending -> sent | failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    lob_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # Worker poll: WHERE status = ? AND next_attempt_at <= now
+    __table_args__ = (
+        Index('ix_mail_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class CivicCache(Base):
+    """Representatives for a normalized address or ZIP (see civic_engine)."""
+    __tablename__ = 'civic_cache'
+    key = Column(String, primary_key=True)
+    targets = Column(Text, nullable=False)  # JSON
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
-    Base.metadata.create_all(get_engine())
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    # create_all skips existing tables, so add any missing indexes explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_session():
-    return sessionmaker(bind=get_engine())()
+    """Thread-local session bound to the shared engine."""
+    global _session_factory
+    if _session_factory is None:
+        with _engine_lock:
+            if _session_factory is None:
+                _session_factory = scoped_session(sessionmaker(bind=get_engine()))
+    return _session_factory()
 
 def get_user_by_email(email):
     session = get_session()
@@ -123,15 +259,112 @@ def get_letter(letter_id):
     session.close()
     return letter
 
-def get_admin_queue():
+ADMIN_PAGE_SIZE = 25
+
+def get_admin_queue(limit=None, cursor=None, status='Queued'):
+    """
+    Letters in `status` (Queued by default), newest first.
+    Keyset pagination: pass the (created_at, id) cursor of the last letter
+    on the previous page to fetch the next one.
+    """
     session = get_session()
     try:
-        letters = session.query(Letter).options(joinedload(Letter.author)).filter(Letter.status == 'Queued').order_by(Letter.created_at.desc()).all()
+        query = session.query(Letter).options(joinedload(Letter.author)).filter(Letter.status == status)
+        if cursor:
+            created_at, letter_id = cursor
+            query = query.filter(or_(
+                Letter.created_at < created_at,
+                and_(Letter.created_at == created_at, Letter.id < letter_id)
+            ))
+        query = query.order_by(Letter.created_at.desc(), Letter.id.desc())
+        if limit:
+            query = query.limit(limit)
+        letters = query.all()
         session.expunge_all() 
         return letters
     finally:
         session.close()
 
+def get_admin_queue_page(cursor=None, page_size=ADMIN_PAGE_SIZE):
+    """Returns (letters, next_cursor); next_cursor is None on the last page."""
+    letters = get_admin_queue(limit=page_size + 1, cursor=cursor)
+    if len(letters) <= page_size:
+        return letters, None
+    letters = letters[:page_size]
+    last = letters[-1]
+    return letters, (last.created_at, last.id)
+
+def get_queue_count(status='Queued'):
+    """COUNT(*) for the admin header without loading any rows."""
+    session = get_session()
+    try:
+        return session.query(func.count(Letter.id)).filter(Letter.status == status).scalar() or 0
+    finally:
+        session.close()
+
+PRINT_FETCH_SIZE = 50
+
+def iter_print_batch(letter_ids=None, fetch_size=PRINT_FETCH_SIZE):
+    """
+    Yields queued letters in USPS presort order (recipient ZIP, then id),
+    optionally restricted to letter_ids. Rows are fetched fetch_size at a
+    time by keyset, so a large batch never sits in memory at once.
+    """
+    zip_key = func.coalesce(Letter.recipient_zip, '')
+    cursor = None
+    while True:
+        session = get_session()
+        try:
+            query = session.query(Letter).options(joinedload(Letter.author)).filter(Letter.status == 'Queued')
+            if letter_ids is not None:
+                query = query.filter(Letter.id.in_(list(letter_ids)))
+            if cursor:
+                last_zip, last_id = cursor
+                query = query.filter(or_(
+                    zip_key > last_zip,
+                    and_(zip_key == last_zip, Letter.id > last_id)
+                ))
+            letters = query.order_by(zip_key, Letter.id).limit(fetch_size).all()
+            session.expunge_all()
+        finally:
+            session.close()
+
+        yield from letters
+        if len(letters) < fetch_size:
+            return
+        last = letters[-1]
+        cursor = (last.recipient_zip or '', last.id)
+
+def mark_batch_printed(letter_ids):
+    """Moves a whole print batch from Queued to Printed in one transaction. Returns rows updated."""
+    session = get_session()
+    try:
+        updated = session.query(Letter).filter(
+            Letter.id.in_(list(letter_ids)), Letter.status == 'Queued'
+        ).update({Letter.status: 'Printed'}, synchronize_session=False)
+        session.commit()
+        return updated
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def mark_batch_mailed(letter_ids):
+    """Moves printed letters to Sent once they are in the mail. Returns rows updated."""
+    session = get_session()
+    try:
+        updated = session.query(Letter).filter(
+            Letter.id.in_(list(letter_ids)), Letter.status == 'Printed'
+        ).update({Letter.status: 'Sent'}, synchronize_session=False)
+        session.commit()
+        return updated
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 def mark_as_sent(letter_id):
     session = get_session()
     try:
@@ -154,5 +387,158 @@ def update_letter_status(letter_id, new_status, content=None):
     finally:
         session.close()
 
+# --- MAIL OUTBOX ---
+def enqueue_mail(idempotency_key, pdf, to_address, from_address, letter_id=None):
+    """
+    Records a letter to mail. Enqueuing the same idempotency_key twice is a
+    no-op, so a repeated finalize can't double-mail. Marks the letter
+    'Mailing'. Returns the outbox id.
+    """
+    session = get_session()
+    try:
+        item = OutboxMail(
+            idempotency_key=idempotency_key, pdf=bytes(pdf), letter_id=letter_id,
+            to_address=json.dumps(to_address), from_address=json.dumps(from_address)
+        )
+        session.add(item)
+        if letter_id:
+            letter = session.query(Letter).filter_by(id=letter_id).first()
+            if letter:
+                letter.status = "Mailing"
+        session.commit()
+        return item.id
+    except IntegrityError:
+        session.rollback()
+        return session.query(OutboxMail.id).filter_by(idempotency_key=idempotency_key).scalar()
+    finally:
+        session.close()
+
+def claim_mail(limit, lease_seconds):
+    """
+    Claims up to `limit` due outbox rows for this worker (pending and due,
+    or stuck in 'sending' past the lease) and returns them detached.
+    """
+    now = datetime.utcnow()
+    session = get_session()
+    try:
+        items = session.query(OutboxMail).filter(or_(
+            and_(OutboxMail.status == 'pending', OutboxMail.next_attempt_at <= now),
+            and_(OutboxMail.status == 'sending', OutboxMail.updated_at < now - timedelta(seconds=lease_seconds)),
+        )).order_by(OutboxMail.next_attempt_at, OutboxMail.id).limit(limit).with_for_update(skip_locked=True).all()
+        for item in items:
+            item.status = 'sending'
+            item.attempts = (item.attempts or 0) + 1
+            item.updated_at = now
+        session.commit()
+        for item in items:
+            session.refresh(item)
+        session.expunge_all()
+        return items
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def finish_mail(item_id, lob_id=None, error=None, retry_at=None):
+    """
+    Records one attempt: sent (lob_id), retry later (retry_at) or failed.
+    When a letter has nothing left in flight its status becomes 'Sent', or
+    'Mail Failed' if any of its mail failed.
+    """
+    session = get_session()
+    try:
+        item = session.query(OutboxMail).filter_by(id=item_id).first()
+        if not item:
+            return
+        item.updated_at = datetime.utcnow()
+        item.last_error = error
+        if lob_id:
+            item.status, item.lob_id = 'sent', lob_id
+        elif retry_at:
+            item.status, item.next_attempt_at = 'pending', retry_at
+        else:
+            item.status = 'failed'
+
+        if item.letter_id:
+            session.flush()
+            statuses = [row[0] for row in session.query(OutboxMail.status).filter_by(letter_id=item.letter_id)]
+            if not any(status in ('pending', 'sending') for status in statuses):
+                letter = session.query(Letter).filter_by(id=item.letter_id).first()
+                if letter:
+                    letter.status = "Mail Failed" if 'failed' in statuses else "Sent"
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_failed_mail(limit=ADMIN_PAGE_SIZE):
+    """Outbox rows that gave up, newest first, with Lob's error (PDF not loaded)."""
+    session = get_session()
+    try:
+        items = session.query(OutboxMail).options(defer(OutboxMail.pdf)).filter(
+            OutboxMail.status == 'failed'
+        ).order_by(OutboxMail.updated_at.desc(), OutboxMail.id.desc()).limit(limit).all()
+        session.expunge_all()
+        return items
+    finally:
+        session.close()
+
+def retry_mail(item_id):
+    """Puts a failed outbox row back in line (fresh attempt budget); its letter is 'Mailing' again."""
+    session = get_session()
+    try:
+        item = session.query(OutboxMail).filter_by(id=item_id, status='failed').first()
+        if not item:
+            return False
+        item.status, item.attempts = 'pending', 0
+        item.next_attempt_at = item.updated_at = datetime.utcnow()
+        if item.letter_id:
+            letter = session.query(Letter).filter_by(id=item.letter_id).first()
+            if letter:
+                letter.status = "Mailing"
+        session.commit()
+        return True
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_outbox_counts():
+    session = get_session()
+    try:
+        return dict(session.query(OutboxMail.status, func.count(OutboxMail.id)).group_by(OutboxMail.status).all())
+    finally:
+        session.close()
+
+# --- CIVIC CACHE ---
+def get_civic_cache(key):
+    """Cached representative list for key, or None if missing or expired."""
+    session = get_session()
+    try:
+        row = session.query(CivicCache).filter_by(key=key).first()
+        if row is None or row.expires_at < datetime.utcnow():
+            return None
+        return json.loads(row.targets)
+    finally:
+        session.close()
+
+def put_civic_cache(key, targets, ttl_seconds):
+    session = get_session()
+    try:
+        session.merge(CivicCache(
+            key=key, targets=json.dumps(targets),
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds), created_at=datetime.utcnow()
+        ))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
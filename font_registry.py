@@ -0,0 +1,182 @@
+"""
+Process-wide font registry for letter_format.
+
+fpdf2 parses a TrueType/OpenType font from scratch on every FPDF.add_font()
+call: cmap, horizontal metrics and widths for every glyph. For the Noto CJK
+collection that is tens of thousands of glyphs per letter. Here each font is
+parsed once per process (optionally once per host, via a pickle keyed by the
+font file's hash) and every new document gets a cheap per-document copy:
+shared, read-only metrics with fresh subset state and a freshly opened
+fontTools handle (fpdf2 subsets that handle in place when it writes the PDF).
+"""
+import copy
+import hashlib
+import os
+import pickle
+import threading
+from collections import defaultdict
+
+# This module copies fpdf2 font internals; it is written against exactly this
+# release (pinned in requirements.txt) and refuses to run against any other
+FPDF_VERSION = "2.8.9"
+ENABLED = True
+# Optional on-disk tier for parsed metrics
+DISK_DIR = os.environ.get("VERBAPOST_FONT_CACHE_DIR")
+
+_templates = {}
+_lock = threading.Lock()
+_stats = {"parsed": 0, "disk_hits": 0, "reused": 0}
+
+# Per-document state that must never be shared between FPDF instances
+_PER_DOCUMENT = ("i", "ttfont", "subset", "missing_glyphs", "biggest_size_pt", "_hbfont", "color_font", "desc")
+# Further TTFFont slots read or rebuilt here and in detach_fonts
+_REQUIRED_SLOTS = _PER_DOCUMENT + ("cw", "ttffile", "collection_font_number", "is_cff", "is_cid_keyed")
+_compatible = False
+
+class IncompatibleFPDF(RuntimeError):
+    """The installed fpdf2 isn't the release this module's copying was written for."""
+
+def check_compatible():
+    """Raises IncompatibleFPDF unless fpdf2's font internals are the ones copied here."""
+    global _compatible
+    if _compatible:
+        return
+    import fpdf
+    from fpdf import fonts
+    missing = [slot for slot in _REQUIRED_SLOTS if slot not in getattr(fonts.TTFFont, "__slots__", ())]
+    if not hasattr(fonts, "SubsetMap"):
+        missing.append("SubsetMap")
+    if fpdf.__version__ != FPDF_VERSION or missing:
+        raise IncompatibleFPDF(
+            f"font_registry needs fpdf2=={FPDF_VERSION} (installed: {fpdf.__version__}"
+            f"{', missing ' + ', '.join(missing) if missing else ''}). "
+            f"Install the version pinned in requirements.txt."
+        )
+    _compatible = True
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _open_ttfont(path, collection_font_number=0):
+    from fontTools import ttLib
+    return ttLib.TTFont(path, recalcTimestamp=False, fontNumber=collection_font_number, lazy=True)
+
+def _disk_path(path, style, collection_font_number):
+    import fpdf
+    key = f"{_file_hash(path)}_{style}_{collection_font_number}_{fpdf.__version__}"
+    return os.path.join(DISK_DIR, f"{key}.pkl")
+
+def _to_disk(template, pkl_path):
+    state = {slot: getattr(template, slot) for slot in type(template).__slots__
+             if slot not in _PER_DOCUMENT and hasattr(template, slot)}
+    state["cw"] = (dict(template.cw), template.desc.missing_width)
+    state["desc"] = template.desc
+    os.makedirs(DISK_DIR, exist_ok=True)
+    tmp_path = f"{pkl_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, pkl_path)
+
+def _from_disk(pkl_path):
+    from fpdf.fonts import TTFFont
+    with open(pkl_path, "rb") as f:
+        state = pickle.load(f)
+    widths, default_width = state.pop("cw")
+    template = TTFFont.__new__(TTFFont)
+    for slot, value in state.items():
+        setattr(template, slot, value)
+    template.cw = defaultdict(lambda: default_width, widths)
+    return template
+
+def _parse(path, fontkey, style, collection_font_number):
+    """Full fpdf2 parse, done once per font per process."""
+    from fpdf import FPDF
+    from fpdf.fonts import TTFFont
+
+    pkl_path = None
+    if DISK_DIR:
+        try:
+            pkl_path = _disk_path(path, style, collection_font_number)
+            if os.path.exists(pkl_path):
+                template = _from_disk(pkl_path)
+                _stats["disk_hits"] += 1
+                return template
+        except Exception as e:
+            print(f"⚠️ Font cache read failed for {path}: {e}")
+
+    template = TTFFont(FPDF(), path, fontkey, style, collection_font_number=collection_font_number)
+    _stats["parsed"] += 1
+    if pkl_path:
+        try:
+            _to_disk(template, pkl_path)
+        except Exception as e:
+            print(f"⚠️ Font cache write failed for {path}: {e}")
+    # Documents open their own handle; don't keep the parsed tables alive
+    template.ttfont.close()
+    template.ttfont = None
+    return template
+
+def _get_template(path, fontkey, style, collection_font_number):
+    key = (os.path.abspath(path), fontkey, collection_font_number)
+    template = _templates.get(key)
+    if template is None:
+        with _lock:
+            template = _templates.get(key)
+            if template is None:
+                template = _parse(path, fontkey, style, collection_font_number)
+                _templates[key] = template
+    return template
+
+def add_font(pdf, family, style, path, collection_font_number=0):
+    """
+    Drop-in for pdf.add_font(family, style, path) that reuses parsed fonts.
+    Raises IncompatibleFPDF if fpdf2 isn't the pinned release.
+    """
+    if not ENABLED:
+        pdf.add_font(family, style, path, collection_font_number=collection_font_number)
+        return
+
+    check_compatible()
+    from fpdf.fonts import SubsetMap
+
+    style = "".join(sorted(style.upper()))
+    fontkey = f"{family.lower()}{style}"
+    if fontkey in pdf.fonts:
+        return
+    template = _get_template(path, fontkey, style, collection_font_number)
+    font = copy.copy(template)
+    font.i = len(pdf.fonts) + 1
+    font.ttfont = _open_ttfont(path, collection_font_number)
+    font.desc = copy.copy(template.desc)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    font.color_font = None
+    font.subset = SubsetMap(font)
+
+    pdf.fonts[fontkey] = font
+    if font.is_cff and font.is_cid_keyed:
+        pdf._set_min_pdf_version("1.6")
+    _stats["reused"] += 1
+
+def detach_fonts(pdf):
+    """
+    After copy.deepcopy(pdf): fpdf2 shares each font's fontTools handle and
+    descriptor between the copies, and output() mutates both. Give the copy
+    its own. Raises IncompatibleFPDF if fpdf2 isn't the pinned release.
+    """
+    check_compatible()
+    for font in pdf.fonts.values():
+        if getattr(font, "ttfont", None) is None:
+            continue  # core font
+        font.ttfont = _open_ttfont(str(font.ttffile), getattr(font, "collection_font_number", 0))
+        font.desc = copy.copy(font.desc)
+
+def get_stats():
+    stats = dict(_stats)
+    stats["fonts"] = len(_templates)
+    return stats
@@ -1,17 +1,33 @@
+"""
+Build-time font fetcher. The app itself never downloads fonts: it renders
+from the files listed in letter_format.FONT_MANIFEST. Run this when preparing
+a deployment to fetch optional fonts that aren't bundled (e.g. Roboto) or to
+repair a missing/empty one, then check the result with the preflight report.
+"""
+import os
 import requests
+import letter_format
 
-def download():
-    print("⬇️  Downloading Indie Flower font...")
-    # Direct link to the raw TTF file
-    url = "https://raw.githubusercontent.com/google/fonts/main/ofl/indieflower/IndieFlower-Regular.ttf"
+def download(force=False):
+    for entry in letter_format.FONT_MANIFEST:
+        path = letter_format.font_path(entry)
+        if not entry["url"]:
+            continue
+        if os.path.exists(path) and os.path.getsize(path) > 0 and not force:
+            continue
 
-    r = requests.get(url)
-    if r.status_code == 200:
-        with open("IndieFlower-Regular.ttf", "wb") as f:
-            f.write(r.content)
-        print("✅ Success! Font saved as 'IndieFlower-Regular.ttf'")
-    else:
-        print(f"❌ Failed. Status code: {r.status_code}")
+        print(f"⬇️  Downloading {entry['name']} -> {entry['file']}...")
+        r = requests.get(entry["url"], allow_redirects=True, timeout=30)
+        if r.status_code == 200:
+            with open(path, "wb") as f:
+                f.write(r.content)
+            print(f"✅ Saved {entry['file']}")
+        else:
+            print(f"❌ Failed. Status code: {r.status_code}")
+
+    print("\n--- PREFLIGHT ---")
+    for name, status in letter_format.preflight(force=True).items():
+        print(f"{'✅' if status == 'ok' else '❌'} {name}: {status}")
 
 if __name__ == "__main__":
     download()
@@ -1,80 +1,179 @@
 from fpdf import FPDF
+import copy
+import io
 import os
-import requests
+import hashlib
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import font_registry
+import signature_image
 
-# --- FONT SOURCES ---
-FONTS = {
-    "Caveat": "https://github.com/google/fonts/raw/main/ofl/caveat/Caveat-Regular.ttf",
-    "Roboto": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
-    "Roboto-Bold": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Bold.ttf"
-}
+# --- FONT MANIFEST ---
+# Fonts are resolved from files shipped with the app; rendering never downloads.
+# sha256 pins the bundled file (None = not pinned, e.g. distro packages).
+# `url` is only used by get_font.py at build time to fetch optional fonts.
+FONT_DIR = os.path.dirname(os.path.abspath(__file__))
 CJK_PATH = "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc"
 
-def ensure_fonts():
-    """Downloads fonts to current directory."""
-    for name, url in FONTS.items():
-        filename = f"{name}.ttf"
-        if not os.path.exists(filename):
-            try:
-                r = requests.get(url, allow_redirects=True)
-                if r.status_code == 200:
-                    with open(filename, "wb") as f:
-                        f.write(r.content)
-                    print(f"✅ Downloaded {name}")
-                else:
-                    print(f"❌ Failed to download {name}: {r.status_code}")
-            except Exception as e:
-                print(f"❌ Error downloading {name}: {e}")
-
-def create_pdf(content, recipient_addr, return_addr, is_heirloom, language, filename="letter.pdf", signature_path=None):
-    # 1. Ensure fonts exist locally
-    ensure_fonts()
-    
+FONT_MANIFEST = [
+    {"name": "Caveat", "style": "", "role": "hand", "required": True,
+     "file": "Caveat-VariableFont_wght.ttf",
+     "sha256": "2849e2b28ab6c60e7fe090c759285a5a823acda2abee69c762b419117568752a",
+     "url": "https://github.com/google/fonts/raw/main/ofl/caveat/Caveat%5Bwght%5D.ttf"},
+    {"name": "IndieFlower", "style": "", "role": "hand_alt", "required": False,
+     "file": "IndieFlower-Regular.ttf",
+     "sha256": "ccc94b22b156e9c5dfe50fd051f01b097600b252c24473e624bb43a143140a94",
+     "url": "https://raw.githubusercontent.com/google/fonts/main/ofl/indieflower/IndieFlower-Regular.ttf"},
+    {"name": "GreatVibes", "style": "", "role": "script", "required": False,
+     "file": "GreatVibes-Regular.ttf",
+     "sha256": "8671b4332bff26a2ca32c7388a2929320e0ade036e460bd76cd1a22abbd4d5b4",
+     "url": "https://github.com/google/fonts/raw/main/ofl/greatvibes/GreatVibes-Regular.ttf"},
+    {"name": "DancingScript", "style": "", "role": "script_alt", "required": False,
+     "file": "DancingScript-Regular.ttf", "sha256": None,
+     "url": "https://github.com/google/fonts/raw/main/ofl/dancingscript/DancingScript%5Bwght%5D.ttf"},
+    {"name": "Roboto", "style": "", "role": "sans", "required": False,
+     "file": "Roboto.ttf", "sha256": None,
+     "url": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf"},
+    {"name": "Roboto", "style": "B", "role": "sans", "required": False,
+     "file": "Roboto-Bold.ttf", "sha256": None,
+     "url": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Bold.ttf"},
+    {"name": "NotoCJK", "style": "", "role": "cjk", "required": False,
+     "file": CJK_PATH, "sha256": None, "url": None},
+]
+
+# The 350 px signature canvas prints 40 mm wide; cropped signatures keep that scale
+SIG_MM_PER_PX = 40 / 350
+
+# Letters per file when a print batch is written to disk (create_print_batches)
+PRINT_CHUNK_LETTERS = 100
+
+# Bump whenever the layout below changes so cached PDFs are re-rendered
+TEMPLATE_VERSION = "2"
+
+_preflight_report = None
+
+_size_lock = threading.Lock()
+_size_stats = {"documents": 0, "total_bytes": 0, "max_bytes": 0, "last_bytes": 0}
+
+def font_path(entry):
+    return entry["file"] if os.path.isabs(entry["file"]) else os.path.join(FONT_DIR, entry["file"])
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _check_font(entry):
+    path = font_path(entry)
+    if not os.path.exists(path):
+        return "missing"
+    if os.path.getsize(path) == 0:
+        return "empty file"
+    if entry["sha256"] and _file_sha256(path) != entry["sha256"]:
+        return "checksum mismatch"
+    try:
+        # Parses into the font registry, so the first letter doesn't pay for it
+        font_registry.add_font(FPDF(), entry["name"], entry["style"], path)
+    except Exception as e:
+        return f"unreadable ({e})"
+    return "ok"
+
+def preflight(force=False):
+    """
+    Validates every manifest font once per process and warms the font
+    registry. Returns {"Name/style": status}. Safe to call on every rerun.
+    Raises font_registry.IncompatibleFPDF if fpdf2 isn't the pinned release.
+    """
+    global _preflight_report
+    if _preflight_report is not None and not force:
+        return _preflight_report
+    # Fail closed: never render letters through copied internals of another fpdf2
+    font_registry.check_compatible()
+
+    report = {}
+    for entry in FONT_MANIFEST:
+        status = _check_font(entry)
+        report[f"{entry['name']}{'/' + entry['style'] if entry['style'] else ''}"] = status
+        if status != "ok":
+            icon = "❌" if entry["required"] else "⚠️"
+            print(f"{icon} Font {entry['name']} ({entry['file']}): {status}")
+    _preflight_report = report
+    return report
+
+def available_fonts():
+    """role -> family name, only for fonts that passed preflight (all styles present)."""
+    report = preflight()
+    roles = {}
+    for entry in FONT_MANIFEST:
+        key = f"{entry['name']}{'/' + entry['style'] if entry['style'] else ''}"
+        ok = report.get(key) == "ok"
+        if entry["role"] not in roles:
+            roles[entry["role"]] = entry["name"] if ok else None
+        elif not ok:
+            roles[entry["role"]] = None
+    return {role: name for role, name in roles.items() if name}
+
+def _register_fonts(pdf, language, font_map):
+    """
+    Registers the fonts `language` needs that aren't in font_map yet and
+    returns that language's layout fonts. font_map (role -> family) is
+    updated in place, so a document shared by several languages only
+    registers each font once.
+    """
+    # Bundled fonts (validated once per process by preflight; never downloads)
+    fonts = available_fonts()
+    use_cjk = language in ["Japanese", "Chinese", "Korean"] and 'cjk' in fonts
+
+    # Parsed once per process by font_registry; each PDF gets a cheap copy.
+    # Only the roles this letter uses are registered.
+    wanted_roles = ['cjk'] if use_cjk else ['hand', 'sans']
+    for entry in FONT_MANIFEST:
+        role = entry["role"]
+        if role not in wanted_roles or fonts.get(role) != entry["name"]:
+            continue
+        if f"{entry['name'].lower()}{entry['style']}" in pdf.fonts:
+            font_map[role] = entry["name"]  # already registered in this document
+            continue
+        try:
+            font_registry.add_font(pdf, entry["name"], entry["style"], font_path(entry))
+            font_map[role] = entry["name"]
+        except Exception as e:
+            print(f"❌ Font {entry['name']} failed to load: {e}")
+
+    # --- LOGIC: SELECT FONT ---
+    if use_cjk and 'cjk' in font_map:
+        return {'body': font_map['cjk'], 'addr': font_map['cjk'], 'body_size': 12}
+    body_font = font_map.get('hand', 'Helvetica') # Caveat
+    addr_font = font_map.get('sans', 'Helvetica') # Roboto
+    return {'body': body_font, 'addr': addr_font, 'body_size': 16 if body_font == 'Caveat' else 12}
+
+def _blank_pdf():
     # FIXED: Force 'Letter' size (8.5x11) for Lob compatibility
     pdf = FPDF(format='Letter')
-    
-    # 2. REGISTER FONTS (MUST BE BEFORE ADD_PAGE)
-    # We use try/except blocks to prevent crashing if a font is corrupt
-    font_map = {}
-    
-    # English Handwriting
-    if os.path.exists("Caveat.ttf"):
-        try:
-            pdf.add_font('Caveat', '', 'Caveat.ttf', uni=True)
-            font_map['hand'] = 'Caveat'
-        except: font_map['hand'] = 'Helvetica'
-    else:
-        font_map['hand'] = 'Helvetica'
-
-    # Professional Sans
-    if os.path.exists("Roboto.ttf") and os.path.exists("Roboto-Bold.ttf"):
-        try:
-            pdf.add_font('Roboto', '', 'Roboto.ttf', uni=True)
-            pdf.add_font('Roboto', 'B', 'Roboto-Bold.ttf', uni=True)
-            font_map['sans'] = 'Roboto'
-        except: font_map['sans'] = 'Helvetica'
-    else:
-        font_map['sans'] = 'Helvetica'
-
-    # CJK
-    if os.path.exists(CJK_PATH):
-        try:
-            pdf.add_font('NotoCJK', '', CJK_PATH, uni=True)
-            font_map['cjk'] = 'NotoCJK'
-        except: pass
+    # Flate-compress page streams and images; TrueType fonts are subset to
+    # the glyphs used when the document is output
+    pdf.set_compression(True)
+    return pdf
 
+def _new_document(language):
+    """Blank Letter-size PDF with this language's fonts registered. Returns (pdf, fonts dict)."""
+    pdf = _blank_pdf()
+    # REGISTER FONTS (MUST BE BEFORE ADD_PAGE)
+    fonts = _register_fonts(pdf, language, {})
     pdf.add_page()
-    
-    # --- LOGIC: SELECT FONT ---
-    if language in ["Japanese", "Chinese", "Korean"] and 'cjk' in font_map:
-        body_font = font_map['cjk']
-        addr_font = font_map['cjk']
-        body_size = 12
-    else:
-        body_font = font_map['hand'] # Caveat
-        addr_font = font_map['sans'] # Roboto
-        body_size = 16 if body_font == 'Caveat' else 12
+    return pdf, fonts
+
+def _draw_shared(pdf, fonts, return_addr, content, signature, date=None):
+    """
+    Everything except the recipient block: identical for every copy of a
+    letter. `date` (default: today) is printed in the header.
+    """
+    addr_font = fonts['addr']
 
     # --- LAYOUT ---
     
@@ -83,31 +182,165 @@ def create_pdf(content, recipient_addr, return_addr, is_heirloom, language, file
     pdf.set_xy(10, 10)
     pdf.multi_cell(0, 5, return_addr)
     
-    # 2. Recipient (Window)
-    pdf.set_xy(20, 40)
-    pdf.set_font(addr_font, 'B' if addr_font != 'NotoCJK' else '', 12)
-    pdf.multi_cell(0, 6, recipient_addr)
-    
     # 3. Date
     pdf.set_xy(160, 10)
     pdf.set_font(addr_font, '', 10)
-    pdf.cell(0, 10, datetime.now().strftime("%Y-%m-%d"), ln=True, align='R')
+    pdf.cell(0, 10, (date or datetime.now()).strftime("%Y-%m-%d"), ln=True, align='R')
     
     # 4. Body
     pdf.set_xy(10, 80)
-    pdf.set_font(body_font, '', body_size)
+    pdf.set_font(fonts['body'], '', fonts['body_size'])
     pdf.multi_cell(0, 8, content)
     
-    # 5. Sig
-    if signature_path and os.path.exists(signature_path):
+    # 5. Sig: compact PNG bytes (signature_image.compact) or a legacy image path
+    if isinstance(signature, (bytes, bytearray)):
         pdf.ln(10)
-        pdf.image(signature_path, w=40)
+        pdf.image(io.BytesIO(signature), w=signature_image.png_size(signature)[0] * SIG_MM_PER_PX)
+    elif signature and os.path.exists(signature):
+        pdf.ln(10)
+        pdf.image(signature, w=40)
     
-    # 6. Footer
+    # 6. Footer: inside the bottom margin, so keep it from breaking onto a page of its own
+    pdf.set_auto_page_break(False)
     pdf.set_y(-20)
     pdf.set_font(addr_font, '', 8)
     pdf.cell(0, 10, 'Dictated via VerbaPost.com', 0, 0, 'C')
+    pdf.set_auto_page_break(True, pdf.b_margin)
+
+def _draw_recipient(pdf, fonts, recipient_addr, page=1):
+    # 2. Recipient (Window) - always on the letter's first page
+    addr_font = fonts['addr']
+    pdf.page = page
+    pdf.set_xy(20, 40)
+    pdf.set_font(addr_font, 'B' if addr_font != 'NotoCJK' else '', 12)
+    pdf.multi_cell(0, 6, recipient_addr)
+
+def _finish(pdf, filename, as_bytes):
+    """Outputs the document (bytes, or the path: `filename` if absolute, else /tmp/{filename}) and records its size."""
+    data = bytes(pdf.output())
+    with _size_lock:
+        _size_stats["documents"] += 1
+        _size_stats["total_bytes"] += len(data)
+        _size_stats["max_bytes"] = max(_size_stats["max_bytes"], len(data))
+        _size_stats["last_bytes"] = len(data)
+    if as_bytes:
+        return data
+
+    save_path = filename if os.path.isabs(filename) else f"/tmp/{filename}"
+    with open(save_path, "wb") as f:
+        f.write(data)
+    return save_path
+
+def get_size_stats():
+    """Output sizes of PDFs rendered by this process."""
+    with _size_lock:
+        stats = dict(_size_stats)
+    stats["avg_bytes"] = stats["total_bytes"] // stats["documents"] if stats["documents"] else 0
+    return stats
+
+def create_pdf(content, recipient_addr, return_addr, is_heirloom, language, filename="letter.pdf", signature=None, as_bytes=False, date=None):
+    """
+    Renders a letter. Writes /tmp/{filename} and returns the path, or with
+    as_bytes=True returns the PDF bytes without touching the disk. `date`
+    fixes the printed date (e.g. the order date) instead of today's.
+    """
+    pdf, fonts = _new_document(language)
+    _draw_shared(pdf, fonts, return_addr, content, signature, date)
+    _draw_recipient(pdf, fonts, recipient_addr)
+
+    return _finish(pdf, filename, as_bytes)
+
+# ==========================================
+#  BATCH RENDERING (civic letters, campaigns)
+# ==========================================
+BATCH_PARALLEL_MIN = 8  # below this, a process pool costs more than it saves
+BATCH_WORKERS = os.cpu_count() or 1
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def _render_stamped(content, recipient_addrs, return_addr, language, signature):
+    """Lays the shared letter out once, then stamps each recipient onto a copy of it."""
+    master, fonts = _new_document(language)
+    _draw_shared(master, fonts, return_addr, content, signature)
+    pdfs = []
+    for recipient_addr in recipient_addrs:
+        pdf = copy.deepcopy(master)
+        font_registry.detach_fonts(pdf)
+        _draw_recipient(pdf, fonts, recipient_addr)
+        pdfs.append(_finish(pdf, None, True))
+    return pdfs
+
+def _get_batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            # spawn: forking a threaded Streamlit server is unsafe
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _batch_pool
+
+def create_pdf_batch(content, recipient_addrs, return_addr, language, signature=None):
+    """
+    Renders the same letter to many recipients: the body is laid out once
+    (once per worker for large batches) and each PDF only adds its address
+    block. Returns PDF bytes in the order of recipient_addrs.
+    """
+    recipient_addrs = list(recipient_addrs)
+    if len(recipient_addrs) < BATCH_PARALLEL_MIN or BATCH_WORKERS < 2:
+        return _render_stamped(content, recipient_addrs, return_addr, language, signature)
+
+    # One contiguous slice per worker keeps the output order
+    size = -(-len(recipient_addrs) // BATCH_WORKERS)
+    slices = [recipient_addrs[i:i + size] for i in range(0, len(recipient_addrs), size)]
+    pool = _get_batch_pool()
+    futures = [pool.submit(_render_stamped, content, chunk, return_addr, language, signature) for chunk in slices]
+    return [pdf for future in futures for pdf in future.result()]
+
+# ==========================================
+#  PRINT BATCHES (heirloom fulfillment)
+# ==========================================
+def create_print_batch(letters, language="English", filename="print_batch.pdf", as_bytes=False):
+    """
+    Renders many letters into one PDF, each starting on a fresh page, in the
+    order given. `letters` is an iterable of (content, recipient_addr,
+    return_addr[, language[, date]]) and is consumed lazily, so it can
+    stream straight from the database; `language` is the default for rows
+    without one. Each font is registered and embedded once for the whole
+    batch.
+    """
+    pdf = _blank_pdf()
+    font_map, layouts = {}, {}
+    for content, recipient_addr, return_addr, *rest in letters:
+        letter_language = (rest[0] if rest else None) or language
+        date = rest[1] if len(rest) > 1 else None
+        if letter_language not in layouts:
+            layouts[letter_language] = _register_fonts(pdf, letter_language, font_map)
+        fonts = layouts[letter_language]
+        pdf.add_page()
+        # Recipient first: _draw_shared may flow onto further pages
+        _draw_recipient(pdf, fonts, recipient_addr, page=pdf.page)
+        _draw_shared(pdf, fonts, return_addr, content, None, date)
+    if pdf.page == 0:
+        # Empty batch: still a valid (blank) document
+        _register_fonts(pdf, language, font_map)
+        pdf.add_page()
+
+    return _finish(pdf, filename, as_bytes)
 
-    save_path = f"/tmp/{filename}"
-    pdf.output(save_path)
-    return save_path
\ No newline at end of file
+def create_print_batches(letters, directory, language="English", chunk_size=PRINT_CHUNK_LETTERS):
+    """
+    Streams a print batch to disk as consecutive PDFs of at most chunk_size
+    letters (directory/print_batch_001.pdf, ...). fpdf holds a whole
+    document in memory until output, so bounded parts keep memory flat
+    however large the queue is. Returns the file paths in print order.
+    """
+    letters = iter(letters)
+    paths = []
+    while True:
+        chunk = list(itertools.islice(letters, chunk_size))
+        if not chunk:
+            return paths
+        path = os.path.join(os.path.abspath(directory), f"print_batch_{len(paths) + 1:03d}.pdf")
+        paths.append(create_print_batch(chunk, language, filename=path))
@@ -0,0 +1,122 @@
+"""
+Durable mail outbox.
+
+Finalize writes each letter to the database outbox (database.enqueue_mail)
+and returns; a background worker per server process claims due rows,
+sends them with mailer.send_letters and records the outcome. Transient
+failures are retried with exponential backoff, and every Lob call for a
+row carries that row's idempotency key, so a retry after a timeout never
+mails twice.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+import database
+import mailer
+
+# --- CONFIG ---
+POLL_SECONDS = 5
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30      # seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 3600
+LEASE_SECONDS = 300    # a row stuck in 'sending' this long is reclaimed
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def _ensure_schema():
+    """Creates the outbox table on first use. Raises if the database is unreachable."""
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                database.init_db()
+                _schema_ready = True
+
+def idempotency_key(*parts):
+    """Stable key for one physical letter, e.g. (letter id, recipient, text)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return f"verbapost-{digest.hexdigest()[:40]}"
+
+def enqueue(pdf, to_address, from_address, key, letter_id=None):
+    """Stores the letter for mailing and nudges the worker. Returns the outbox id."""
+    _ensure_schema()
+    item_id = database.enqueue_mail(key, pdf, to_address, from_address, letter_id)
+    start()
+    _wake.set()
+    return item_id
+
+def retry(item_id):
+    """Re-queues a failed row (admin action) and nudges the worker."""
+    if database.retry_mail(item_id):
+        start()
+        _wake.set()
+        return True
+    return False
+
+def backoff(attempts):
+    """Delay before retry number `attempts`, with jitter so retries don't stampede."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def drain_once():
+    """Sends one batch of due mail. Returns how many rows were attempted."""
+    items = database.claim_mail(BATCH_SIZE, LEASE_SECONDS)
+    if not items:
+        return 0
+    jobs = [(item.pdf, json.loads(item.to_address), json.loads(item.from_address), item.idempotency_key) for item in items]
+    for item, result in zip(items, mailer.send_letters(jobs)):
+        if result["ok"]:
+            database.finish_mail(item.id, lob_id=result["id"] or "unknown")
+        elif result["retryable"] and item.attempts < MAX_ATTEMPTS:
+            retry_at = datetime.utcnow() + timedelta(seconds=backoff(item.attempts))
+            database.finish_mail(item.id, error=result["error"], retry_at=retry_at)
+        else:
+            database.finish_mail(item.id, error=result["error"])
+    return len(items)
+
+def _run():
+    # Never block page loads on the database: wait for it here instead
+    delay = POLL_SECONDS
+    while True:
+        try:
+            _ensure_schema()
+            break
+        except Exception as e:
+            print(f"Outbox worker: database not ready ({e}); retrying in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX)
+
+    while True:
+        try:
+            # Keep going while there is a backlog; otherwise sleep until poked or polled
+            if drain_once() == BATCH_SIZE:
+                continue
+        except Exception as e:
+            print(f"Outbox worker error: {e}")
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+
+def start():
+    """Starts this process's outbox worker (idempotent)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="mail-outbox", daemon=True)
+            _worker.start()
+
+def get_stats():
+    stats = {"worker_alive": bool(_worker and _worker.is_alive()), "schema_ready": _schema_ready}
+    if _schema_ready:
+        stats.update(database.get_outbox_counts())
+    return stats
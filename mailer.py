@@ -1,45 +1,361 @@
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
-import lob
+
+# --- CONFIG ---
+LOB_LETTERS_URL = "https://api.lob.com/v1/letters"
+LOB_VERIFY_URL = "https://api.lob.com/v1/us_verifications"
+MAX_CONCURRENCY = 4           # letters uploading at once (and pooled connections)
+RATE_LIMIT = (150, 5.0)       # Lob: 150 requests per 5 seconds per endpoint
+MAX_RATE_RETRIES = 3          # retries after a 429
+REQUEST_TIMEOUT = (5, 60)     # connect, read (seconds); uploads can be slow
+VERIFY_TIMEOUT = (3, 10)
+VERIFY_CACHE_ENTRIES = 4096
+VERIFY_TTL = 30 * 24 * 3600       # deliverable addresses rarely change
+VERIFY_TTL_REJECTED = 24 * 3600   # undeliverable ones may be fixed upstream
 
 # Load API Key
 try:
-    lob.api_key = st.secrets["lob"]["api_key"]
+    API_KEY = st.secrets["lob"]["api_key"]
 except:
-    pass
+    API_KEY = None
+
+_session = None
+_session_lock = threading.Lock()
+
+class _RateLimiter:
+    """Token bucket shared by every sending thread."""
+    def __init__(self, requests_per_window, window):
+        self.capacity = requests_per_window
+        self.rate = requests_per_window / window
+        self.tokens = float(requests_per_window)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_limiter = _RateLimiter(*RATE_LIMIT)
+_verify_limiter = _RateLimiter(*RATE_LIMIT)  # Lob limits each endpoint separately
+
+class LobError(RuntimeError):
+    def __init__(self, status, message):
+        super().__init__(f"Lob {status}: {message}")
+        self.status = status
 
-def send_letter(pdf_path, to_address, from_address):
+    @property
+    def retryable(self):
+        # Throttling and server-side trouble; other 4xx won't succeed on retry
+        return self.status == 429 or self.status >= 500
+
+def _get_session():
+    """One keep-alive session per process; its pool matches the concurrency cap."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.auth = (API_KEY or "", "")
+            _session = session
+    return _session
+
+def _open_pdf(pdf):
+    """Path, bytes or file-like -> (file object, whether we opened it)."""
+    if isinstance(pdf, (bytes, bytearray)):
+        buf = io.BytesIO(pdf)
+        buf.name = "letter.pdf"  # multipart upload needs a filename
+        return buf, True
+    if isinstance(pdf, str):
+        return open(pdf, 'rb'), True
+    pdf.seek(0)
+    return pdf, False
+
+def map_address(addr):
+    """Accepts Lob keys or our short keys (street, city, ...)."""
+    return {
+        'name': addr.get('name'),
+        'address_line1': addr.get('address_line1') or addr.get('street'),
+        'address_city': addr.get('address_city') or addr.get('city'),
+        'address_state': addr.get('address_state') or addr.get('state'),
+        'address_zip': addr.get('address_zip') or addr.get('zip')
+    }
+
+def _create_letter(pdf, to_address, from_address, idempotency_key=None):
     """
-    Sends a physical letter via Lob.
-    Handles key mapping (street -> address_line1) automatically.
+    One Lob letter over the pooled session. Returns the letter JSON; raises
+    on failure. With an idempotency_key Lob returns the original letter
+    instead of mailing a second one.
     """
+    clean_to = map_address(to_address)
+    clean_from = map_address(from_address)
+    if not clean_to['address_line1']:
+        raise ValueError("Missing address line for recipient")
+
+    form = {"description": "VerbaPost Letter", "color": "true"}
+    for prefix, addr in (("to", clean_to), ("from", clean_from)):
+        for field, value in addr.items():
+            if value:
+                form[f"{prefix}[{field}]"] = value
+
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+
+    file, owned = _open_pdf(pdf)
     try:
-        # Helper to map keys safely
-        def map_address(addr):
-            return {
-                'name': addr.get('name'),
-                'address_line1': addr.get('address_line1') or addr.get('street'),
-                'address_city': addr.get('address_city') or addr.get('city'),
-                'address_state': addr.get('address_state') or addr.get('state'),
-                'address_zip': addr.get('address_zip') or addr.get('zip')
-            }
-
-        clean_to = map_address(to_address)
-        clean_from = map_address(from_address)
-
-        # Validation
-        if not clean_to['address_line1']:
-            return {"error": "Missing address line for recipient"}
-
-        with open(pdf_path, 'rb') as file:
-            response = lob.Letter.create(
-                description="VerbaPost Letter",
-                to_address=clean_to,
-                from_address=clean_from,
-                file=file,
-                color=True
+        for attempt in range(MAX_RATE_RETRIES + 1):
+            _limiter.acquire()
+            file.seek(0)
+            response = _get_session().post(
+                LOB_LETTERS_URL, data=form, files={"file": (getattr(file, "name", "letter.pdf"), file, "application/pdf")},
+                headers=headers, timeout=REQUEST_TIMEOUT
             )
-            return response
+            if response.status_code != 429 or attempt == MAX_RATE_RETRIES:
+                break
+            # Throttled anyway (e.g. another process shares the key): back off as told
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+        if response.status_code >= 400:
+            try:
+                message = response.json()["error"]["message"]
+            except Exception:
+                message = response.text[:200]
+            raise LobError(response.status_code, message)
+        return response.json()
+    finally:
+        if owned:
+            file.close()
 
+def _send_one(job):
+    pdf, to_address, from_address, *rest = job
+    try:
+        letter = _create_letter(pdf, to_address, from_address, *rest)
+        return {"ok": True, "id": letter.get("id"), "response": letter, "error": None, "retryable": False}
+    except LobError as e:
+        return {"ok": False, "id": None, "response": None, "error": str(e), "retryable": e.retryable}
+    except requests.RequestException as e:
+        # Timeouts, resets, DNS: the letter may or may not exist; the idempotency key makes a retry safe
+        return {"ok": False, "id": None, "response": None, "error": str(e), "retryable": True}
     except Exception as e:
-        st.error(f"Mailer Error: {e}")
+        return {"ok": False, "id": None, "response": None, "error": str(e), "retryable": False}
+
+def send_letters(jobs, max_concurrency=MAX_CONCURRENCY):
+    """
+    Sends many letters concurrently. `jobs` is an iterable of
+    (pdf, to_address, from_address[, idempotency_key]). Returns one result
+    dict per job, in order: {"ok", "id", "response", "error", "retryable"}.
+    Never raises for a single failed letter.
+    """
+    jobs = list(jobs)
+    if len(jobs) <= 1 or max_concurrency <= 1:
+        return [_send_one(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, MAX_CONCURRENCY, len(jobs)), thread_name_prefix="lob") as pool:
+        return list(pool.map(_send_one, jobs))
+
+def send_letter(pdf, to_address, from_address):
+    """
+    Sends a physical letter via Lob.
+    `pdf` is a file path, the PDF bytes, or a file-like buffer.
+    Handles key mapping (street -> address_line1) automatically.
+    """
+    result = _send_one((pdf, to_address, from_address))
+    if not result["ok"]:
+        st.error(f"Mailer Error: {result['error']}")
         return None
+    return result["response"]
+
+# ==========================================
+#  ADDRESS NORMALIZATION + VERIFICATION
+# ==========================================
+# USPS Publication 28 abbreviations (the common ones), by position in the line
+STREET_SUFFIXES = {
+    "ALLEY": "ALY", "AVENUE": "AVE", "BOULEVARD": "BLVD", "CIRCLE": "CIR", "COURT": "CT",
+    "COVE": "CV", "CROSSING": "XING", "DRIVE": "DR", "EXPRESSWAY": "EXPY", "FREEWAY": "FWY",
+    "HIGHWAY": "HWY", "LANE": "LN", "LOOP": "LOOP", "PARKWAY": "PKWY", "PLACE": "PL",
+    "PLAZA": "PLZ", "POINT": "PT", "ROAD": "RD", "ROUTE": "RTE", "SQUARE": "SQ",
+    "STREET": "ST", "TERRACE": "TER", "TRAIL": "TRL", "WAY": "WAY",
+}
+DIRECTIONALS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+UNIT_DESIGNATORS = {
+    "APARTMENT": "APT", "BUILDING": "BLDG", "FLOOR": "FL", "SUITE": "STE", "UNIT": "UNIT",
+    "ROOM": "RM", "DEPARTMENT": "DEPT",
+}
+STATE_ABBREVIATIONS = {
+    "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR", "CALIFORNIA": "CA",
+    "COLORADO": "CO", "CONNECTICUT": "CT", "DELAWARE": "DE", "DISTRICT OF COLUMBIA": "DC",
+    "FLORIDA": "FL", "GEORGIA": "GA", "HAWAII": "HI", "IDAHO": "ID", "ILLINOIS": "IL",
+    "INDIANA": "IN", "IOWA": "IA", "KANSAS": "KS", "KENTUCKY": "KY", "LOUISIANA": "LA",
+    "MAINE": "ME", "MARYLAND": "MD", "MASSACHUSETTS": "MA", "MICHIGAN": "MI", "MINNESOTA": "MN",
+    "MISSISSIPPI": "MS", "MISSOURI": "MO", "MONTANA": "MT", "NEBRASKA": "NE", "NEVADA": "NV",
+    "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ", "NEW MEXICO": "NM", "NEW YORK": "NY",
+    "NORTH CAROLINA": "NC", "NORTH DAKOTA": "ND", "OHIO": "OH", "OKLAHOMA": "OK", "OREGON": "OR",
+    "PENNSYLVANIA": "PA", "RHODE ISLAND": "RI", "SOUTH CAROLINA": "SC", "SOUTH DAKOTA": "SD",
+    "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT", "VERMONT": "VT", "VIRGINIA": "VA",
+    "WASHINGTON": "WA", "WEST VIRGINIA": "WV", "WISCONSIN": "WI", "WYOMING": "WY",
+    "PUERTO RICO": "PR",
+}
+DELIVERABLE = ("deliverable", "deliverable_unnecessary_unit", "deliverable_incorrect_unit", "deliverable_missing_unit")
+
+_SUFFIX_WORDS = set(STREET_SUFFIXES) | set(STREET_SUFFIXES.values())
+_DIRECTIONAL_WORDS = set(DIRECTIONALS) | set(DIRECTIONALS.values())
+_UNIT_WORDS = set(UNIT_DESIGNATORS) | set(UNIT_DESIGNATORS.values())
+_PO_BOX_RE = re.compile(r"^(?:POST OFFICE|P O|PO) BOX\b")
+_PUNCT_RE = re.compile(r"[.,#]")
+_SPACE_RE = re.compile(r"\s+")
+
+_verify_cache = OrderedDict()  # key -> (expires_at, result)
+_verify_lock = threading.Lock()
+_verify_stats = {"hits": 0, "misses": 0, "rejected": 0, "unverified": 0}
+
+def _clean(value):
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", str(value or "").upper())).strip()
+
+def normalize_zip(value):
+    """'37201', '372011234', '37201 1234' -> '37201' / '37201-1234'; anything else unchanged."""
+    digits = re.sub(r"\D", "", str(value or ""))
+    if len(digits) == 9:
+        return f"{digits[:5]}-{digits[5:]}"
+    if len(digits) == 5:
+        return digits
+    return str(value or "").strip()
+
+def normalize_street(line):
+    """
+    Upper case, single spaces, no punctuation, USPS abbreviations applied
+    by position: a leading or trailing directional, the street suffix
+    (last word of the street), the unit designator. Words inside the
+    street name are left alone: "North Court Street" -> "N COURT ST".
+    """
+    line = _PO_BOX_RE.sub("PO BOX", _clean(line))
+    if line.startswith("PO BOX"):
+        return line
+    words = line.split()
+    # Unit: "... APARTMENT 4" -> "... APT 4"
+    unit = []
+    for i, word in enumerate(words[1:], 1):
+        if word in _UNIT_WORDS and i + 1 < len(words):
+            unit = [UNIT_DESIGNATORS.get(word, word)] + words[i + 1:]
+            words = words[:i]
+            break
+
+    start = 1 if words and any(c.isdigit() for c in words[0]) else 0
+    end = len(words)
+    # A directional with nothing but a suffix after it is the street name ("North Ave")
+    if end - start >= 3 and words[end - 1] in _DIRECTIONAL_WORDS:
+        end -= 1
+        words[end] = DIRECTIONALS.get(words[end], words[end])
+    if end - start >= 2 and words[end - 1] in _SUFFIX_WORDS:
+        end -= 1
+        words[end] = STREET_SUFFIXES.get(words[end], words[end])
+    if end - start >= 2 and words[start] in DIRECTIONALS:
+        words[start] = DIRECTIONALS[words[start]]
+    return " ".join(words + unit)
+
+def normalize_address(addr):
+    """
+    Canonical form of an address (either key style): upper case, single
+    spaces, no punctuation, USPS street/unit/state abbreviations, ZIP or
+    ZIP+4. Two spellings of one address normalize to the same dict.
+    """
+    addr = map_address(addr)
+    state = _clean(addr['address_state'])
+    return {
+        'name': _SPACE_RE.sub(" ", str(addr['name'] or "")).strip(),
+        'address_line1': normalize_street(addr['address_line1']),
+        'address_city': _clean(addr['address_city']),
+        'address_state': STATE_ABBREVIATIONS.get(state, state),
+        'address_zip': normalize_zip(addr['address_zip']),
+    }
+
+def _verify_key(norm):
+    # The name isn't part of deliverability
+    fields = [norm['address_line1'], norm['address_city'], norm['address_state'], norm['address_zip'][:5]]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+def _lob_verify(norm):
+    _verify_limiter.acquire()
+    response = _get_session().post(LOB_VERIFY_URL, data={
+        "primary_line": norm['address_line1'],
+        "city": norm['address_city'],
+        "state": norm['address_state'],
+        "zip_code": norm['address_zip'],
+    }, timeout=VERIFY_TIMEOUT)
+    if response.status_code >= 400:
+        raise LobError(response.status_code, response.text[:200])
+    return response.json()
+
+def verify_address(addr):
+    """
+    Normalizes and verifies a US address, from cache when possible.
+    Returns {"ok", "deliverability", "address", "cached"}; `address` is the
+    USPS-standardized form (Lob keys) when verified, else the normalized
+    input. If Lob can't be reached the address passes unverified (and is
+    not cached) rather than blocking the send.
+    """
+    norm = normalize_address(addr)
+    if not API_KEY:
+        with _verify_lock:
+            _verify_stats["unverified"] += 1
+        return {"ok": True, "deliverability": "unverified", "address": norm, "cached": False}
+    key = _verify_key(norm)
+    now = time.time()
+    with _verify_lock:
+        entry = _verify_cache.get(key)
+        if entry and entry[0] > now:
+            _verify_cache.move_to_end(key)
+            _verify_stats["hits"] += 1
+            return {**entry[1], "address": {**entry[1]["address"], "name": norm['name']}, "cached": True}
+        _verify_stats["misses"] += 1
+
+    try:
+        verified = _lob_verify(norm)
+    except Exception as e:
+        print(f"Address verification unavailable: {e}")
+        with _verify_lock:
+            _verify_stats["unverified"] += 1
+        return {"ok": True, "deliverability": "unverified", "address": norm, "cached": False}
+
+    deliverability = verified.get("deliverability", "undeliverable")
+    components = verified.get("components") or {}
+    ok = deliverability in DELIVERABLE
+    address = norm
+    if ok:
+        zip_code = components.get("zip_code") or norm['address_zip'][:5]
+        plus4 = components.get("zip_code_plus_4")
+        address = {
+            'name': norm['name'],
+            'address_line1': " ".join(filter(None, [verified.get("primary_line"), verified.get("secondary_line")])) or norm['address_line1'],
+            'address_city': components.get("city") or norm['address_city'],
+            'address_state': components.get("state") or norm['address_state'],
+            'address_zip': f"{zip_code}-{plus4}" if plus4 else zip_code,
+        }
+    result = {"ok": ok, "deliverability": deliverability, "address": address}
+    with _verify_lock:
+        if not ok:
+            _verify_stats["rejected"] += 1
+        _verify_cache[key] = (now + (VERIFY_TTL if ok else VERIFY_TTL_REJECTED), result)
+        while len(_verify_cache) > VERIFY_CACHE_ENTRIES:
+            _verify_cache.popitem(last=False)
+    return {**result, "cached": False}
+
+def get_verify_stats():
+    with _verify_lock:
+        return {**_verify_stats, "entries": len(_verify_cache)}
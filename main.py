@@ -1,6 +1,7 @@
 import streamlit as st
 import ui_main
 import ui_splash
+import letter_format
 
 # --- 1. GLOBAL PAGE CONFIG ---
 st.set_page_config(
@@ -84,6 +85,9 @@ def main():
     # Inject CSS immediately
     inject_global_css()
 
+    # Validate bundled fonts once per process (no-op on reruns)
+    letter_format.preflight()
+
     # Initialize Session State
     if "app_mode" not in st.session_state:
         st.session_state.app_mode = "splash" # Start at Splash
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+# --- CONFIG ---
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "verbapost_pdf_cache")
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+_lock = threading.Lock()
+
+def cache_key(letter_id, template_version, *parts):
+    """Content-addressed key: letter id + hash of everything printed + template version."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return f"{letter_id}_{template_version}_{digest.hexdigest()[:32]}"
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pdf")
+
+def get(key):
+    """Returns cached PDF bytes or None."""
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path, None)  # mark as recently used
+        return data
+    except OSError:
+        return None
+
+def put(key, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_path(key)}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, _path(key))
+    _evict()
+
+def get_or_render(key, render):
+    """Returns cached bytes, calling render() -> bytes only on a miss."""
+    data = get(key)
+    if data is None:
+        data = render()
+        put(key, data)
+    return data
+
+def _evict():
+    """Drops least-recently-used entries until the cache fits MAX_CACHE_BYTES."""
+    with _lock:
+        try:
+            entries = []
+            for name in os.listdir(CACHE_DIR):
+                if not name.endswith(".pdf"):
+                    continue
+                full = os.path.join(CACHE_DIR, name)
+                st = os.stat(full)
+                entries.append((st.st_mtime, st.st_size, full))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= MAX_CACHE_BYTES:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,111 @@
+"""
+Speculative letter rendering.
+
+While a user reviews their letter, the review page schedules a render of
+the PDF it would send. Scheduling is debounced per session: each edit
+replaces the pending render, and only text that has been left alone for
+DEBOUNCE_SECONDS is rendered. Finalize looks the PDF up by the same key
+(a hash of everything printed) and only renders itself on a miss.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIG ---
+DEBOUNCE_SECONDS = 1.5
+MAX_READY = 64        # rendered PDFs kept for pick-up
+READY_TTL = 1800      # seconds
+TAKE_TIMEOUT = 30     # max seconds finalize waits on an in-flight render
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prerender")
+_timers = {}           # session slot -> (key, Timer, render, args)
+_renders = OrderedDict()  # key -> (Future, submitted_at)
+_lock = threading.Lock()
+_stats = {"scheduled": 0, "superseded": 0, "rendered": 0, "hits": 0, "misses": 0}
+
+def render_key(*parts):
+    """sha256 over everything that ends up on the page (text, addresses, signature bytes, ...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray)):
+            part = str(part if part is not None else "").encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _prune():
+    # caller holds _lock
+    cutoff = time.time() - READY_TTL
+    for key in [k for k, (_, submitted) in _renders.items() if submitted < cutoff]:
+        del _renders[key]
+    while len(_renders) > MAX_READY:
+        _renders.popitem(last=False)
+
+def _start(key, render, args):
+    # caller holds _lock
+    if key not in _renders:
+        _renders[key] = (_executor.submit(render, *args), time.time())
+        _stats["rendered"] += 1
+        _prune()
+
+def _fire(slot, key):
+    with _lock:
+        pending = _timers.get(slot)
+        if not pending or pending[0] != key:
+            return  # superseded while the timer was firing
+        del _timers[slot]
+        _start(key, pending[2], pending[3])
+
+def schedule(slot, key, render, *args, delay=DEBOUNCE_SECONDS):
+    """
+    Renders render(*args) under `key` once the session `slot` has not
+    scheduled anything else for `delay` seconds. No-op if that key is
+    already rendered or pending.
+    """
+    with _lock:
+        if key in _renders:
+            return
+        pending = _timers.get(slot)
+        if pending:
+            if pending[0] == key:
+                return
+            pending[1].cancel()
+            _stats["superseded"] += 1
+        timer = threading.Timer(delay, _fire, (slot, key))
+        timer.daemon = True
+        _timers[slot] = (key, timer, render, args)
+        _stats["scheduled"] += 1
+    timer.start()
+
+def take(key, timeout=TAKE_TIMEOUT):
+    """
+    The speculatively rendered result for `key`, waiting for it if it is
+    still rendering (or still debouncing), or None if there is none or it
+    failed. A taken result is removed.
+    """
+    with _lock:
+        for slot, (pending_key, timer, render, args) in list(_timers.items()):
+            if pending_key == key:
+                # Finalized before the text "settled": start it now
+                timer.cancel()
+                del _timers[slot]
+                _start(key, render, args)
+        entry = _renders.pop(key, None)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+    try:
+        result = entry[0].result(timeout=timeout)
+    except Exception as e:
+        print(f"Pre-render failed: {e}")
+        result = None
+    with _lock:
+        _stats["hits" if result is not None else "misses"] += 1
+    return result
+
+def get_stats():
+    with _lock:
+        return {**_stats, "debouncing": len(_timers), "ready_or_running": len(_renders)}
@@ -0,0 +1,87 @@
+import hashlib
+import io
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+
+# --- CONFIG ---
+INK_THRESHOLD = 160   # gray level (0-255, over white) darker than this is ink
+PADDING = 4           # px of white kept around the ink bounding box
+CACHE_ENTRIES = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "blank": 0}
+
+def ink_mask(image_data):
+    """(h, w, 4) RGBA canvas array -> (h, w) bool, True where there is ink."""
+    rgba = np.asarray(image_data)
+    rgb = rgba[..., :3].astype(np.float32)
+    alpha = rgba[..., 3:4].astype(np.float32) / 255.0
+    # Composite over white, then ITU-R 601 luma
+    over_white = rgb * alpha + 255.0 * (1.0 - alpha)
+    gray = over_white @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return gray < INK_THRESHOLD
+
+def crop_box(mask, padding=PADDING):
+    """(top, bottom, left, right) slice bounds of the ink, or None for a blank canvas."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    h, w = mask.shape
+    return (
+        max(rows[0] - padding, 0), min(rows[-1] + 1 + padding, h),
+        max(cols[0] - padding, 0), min(cols[-1] + 1 + padding, w),
+    )
+
+def _encode(image_data):
+    mask = ink_mask(image_data)
+    box = crop_box(mask)
+    if box is None:
+        return None
+    top, bottom, left, right = box
+    # 1-bit: ink black, paper white
+    img = Image.fromarray(~mask[top:bottom, left:right]).convert("1")
+    out = io.BytesIO()
+    img.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+def compact(image_data):
+    """
+    Canvas RGBA array -> small 1-bit PNG bytes cropped to the ink, or None
+    if nothing was drawn. Results are cached by content hash, so calling
+    this on every rerun only encodes when the drawing changes.
+    """
+    if image_data is None:
+        return None
+    arr = np.ascontiguousarray(image_data)
+    digest = hashlib.sha256(arr.tobytes())
+    digest.update(str(arr.shape).encode("ascii"))
+    key = digest.hexdigest()
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return _cache[key]
+        _stats["misses"] += 1
+
+    png = _encode(arr)
+    with _lock:
+        if png is None:
+            _stats["blank"] += 1
+        _cache[key] = png
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return png
+
+def png_size(png):
+    """(width, height) in px from the PNG header, without decoding."""
+    return struct.unpack(">II", png[16:24])
+
+def get_stats():
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
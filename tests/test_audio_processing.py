@@ -0,0 +1,122 @@
+import io
+import wave
+import numpy as np
+import pytest
+import ai_engine
+import audio_processing
+
+SR = audio_processing.SAMPLE_RATE
+
+def tone(seconds, amplitude=0.3, freq=220.0):
+    t = np.arange(int(seconds * SR), dtype=np.float32) / SR
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+def speech(*parts):
+    """Alternating speech/pause lengths in seconds, starting with speech."""
+    return np.concatenate([tone(s) if i % 2 == 0 else silence(s) for i, s in enumerate(parts)])
+
+def test_silence_runs():
+    mask = np.array([True, False, False, False, True, False, True, False, False])
+    assert audio_processing.silence_runs(mask, 2) == [(1, 4), (7, 9)]
+    assert audio_processing.silence_runs(np.zeros(0, dtype=bool), 1) == []
+
+def test_short_audio_is_one_chunk():
+    audio = speech(10)
+    assert audio_processing.split_on_silence(audio, max_chunk_seconds=30) == [(0, len(audio))]
+
+def test_splits_in_pauses():
+    audio = speech(12, 1, 12, 1, 12)
+    chunks = audio_processing.split_on_silence(audio, max_chunk_seconds=20, min_chunk_seconds=5)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(end - start <= 20 * SR for start, end in chunks)
+    # Every cut lands inside one of the two pauses
+    pauses = [(12 * SR, 13 * SR), (25 * SR, 26 * SR)]
+    for _, cut in chunks[:-1]:
+        assert any(lo <= cut <= hi for lo, hi in pauses)
+
+def test_hard_cut_without_pauses():
+    audio = speech(50)
+    chunks = audio_processing.split_on_silence(audio, max_chunk_seconds=20)
+    assert chunks == [(0, 20 * SR), (20 * SR, 40 * SR), (40 * SR, len(audio))]
+
+def test_transcribe_chunked_keeps_order():
+    audio = speech(12, 1, 12, 1, 12)
+    def transcribe(chunk):
+        return f" {len(chunk)} "
+    text = ai_engine.transcribe_chunked(audio, transcribe=transcribe, workers=3, chunk_seconds=20)
+    bounds = audio_processing.split_on_silence(audio, max_chunk_seconds=20)
+    assert text == " ".join(str(end - start) for start, end in bounds)
+
+def wav_bytes(audio, sr=SR, channels=1):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+def test_load_audio_decodes_wav_bytes_in_memory():
+    audio = tone(0.5)
+    decoded = audio_processing.load_audio(wav_bytes(audio))
+    assert decoded.dtype == np.float32
+    assert len(decoded) == len(audio)
+    assert np.max(np.abs(decoded - audio)) < 1e-3
+
+def test_load_audio_downmixes_and_resamples():
+    mono = tone(0.5, freq=200.0)
+    stereo = np.repeat(mono[::2], 2)  # 8 kHz, two identical channels
+    decoded = audio_processing.load_audio(wav_bytes(stereo, sr=SR // 2, channels=2))
+    assert abs(len(decoded) - len(mono)) <= 1
+
+def test_load_audio_accepts_paths_and_files(tmp_path):
+    data = wav_bytes(tone(0.2))
+    path = tmp_path / "dictation.wav"
+    path.write_bytes(data)
+    expected = audio_processing.load_audio(data)
+    assert np.array_equal(audio_processing.load_audio(str(path)), expected)
+    with open(path, "rb") as f:
+        assert np.array_equal(audio_processing.load_audio(f), expected)
+
+def test_fingerprint_is_stable_across_sources(tmp_path):
+    data = wav_bytes(tone(0.2))
+    path = tmp_path / "dictation.wav"
+    path.write_bytes(data)
+    buf = io.BytesIO(data)
+    buf.read(10)
+    digests = {audio_processing.fingerprint(data), audio_processing.fingerprint(str(path)),
+               audio_processing.fingerprint(buf, chunk_size=7)}
+    assert len(digests) == 1
+    assert buf.tell() == 0  # caller's file is rewound for the decoder
+    assert audio_processing.fingerprint(data + b"\0") not in digests
+
+def test_preprocess_trims_edges_and_caps_pauses():
+    audio = np.concatenate([silence(2), speech(2, 3, 2), silence(2)])
+    out, report = audio_processing.preprocess(audio)
+    pad, pause = audio_processing.EDGE_PAD_SECONDS, audio_processing.MAX_PAUSE_SECONDS
+    expected = 2 + pause + 2 + 2 * pad
+    assert abs(len(out) / SR - expected) < 0.1
+    assert report["input_seconds"] == 11.0
+    assert report["removed_seconds"] == pytest.approx(11.0 - report["output_seconds"], abs=0.01)
+
+def test_preprocess_keeps_short_pauses():
+    audio = speech(2, 0.4, 2)
+    out, _ = audio_processing.preprocess(audio)
+    assert abs(len(out) - len(audio)) < 0.1 * SR
+
+def test_preprocess_normalizes_quiet_speech_without_clipping():
+    out, report = audio_processing.preprocess(speech(2, 0.5, 2) * 0.05)
+    assert report["gain_db"] > 0
+    assert np.max(np.abs(out)) <= 0.99
+    voiced_rms = np.sqrt(np.mean(np.square(out[np.abs(out) > 0])))
+    assert 20 * np.log10(voiced_rms) == pytest.approx(audio_processing.TARGET_DBFS, abs=1.0)
+
+def test_preprocess_leaves_silence_alone():
+    audio = silence(3)
+    out, report = audio_processing.preprocess(audio)
+    assert len(out) == len(audio)
+    assert report["removed_seconds"] == 0.0
@@ -0,0 +1,45 @@
+import build_civic_index
+
+ZCTA_CD = """GEOID_ZCTA5_20|GEOID_CD119_20|AREALAND_PART
+37201|4705|100
+37203|4705|50
+37203|4707|50
+00601|7298|10
+99999|47ZZ|1
+"""
+
+LEGISLATORS = """last_name,first_name,type,state,district,address
+Smith,Ann,sen,TN,,455 Dirksen Senate Office Building Washington DC 20510
+Jones,Bob,rep,TN,5,2458 Rayburn House Office Building Washington DC 20515-4205
+Diaz,Carla,rep,PR,0,
+"""
+
+def test_parse_zcta_cd():
+    assert build_civic_index.parse_zcta_cd(ZCTA_CD) == {
+        "37201": ["TN-05"],
+        "37203": ["TN-05", "TN-07"],
+        "00601": ["PR-00"],
+    }
+
+def test_parse_legislators():
+    reps, senators = build_civic_index.parse_legislators(LEGISLATORS)
+    assert [t["name"] for t in senators["TN"]] == ["Ann Smith"]
+    assert senators["TN"][0]["address_obj"]["zip"] == "20510"
+    rep = reps["TN-05"][0]
+    assert rep["title"] == "U.S. Representative"
+    assert rep["address_obj"]["street"] == "2458 Rayburn House Office Building"
+    assert rep["address_obj"]["zip"] == "20515"
+    assert reps["PR-00"][0]["address_obj"]["street"] == "United States Capitol"
+
+def test_district_name():
+    assert build_civic_index.district_name("TN", "5") == "TN-05"
+    assert build_civic_index.district_name("DC", "98") == "DC-00"
+
+def test_build_round_trip(tmp_path):
+    zcta, legislators, out = tmp_path / "zcta.txt", tmp_path / "leg.csv", tmp_path / "idx.bin"
+    zcta.write_text(ZCTA_CD)
+    legislators.write_text(LEGISLATORS)
+    build_civic_index.build(str(zcta), str(legislators), str(out))
+    index = build_civic_index.civic_index.Index(str(out))
+    assert [t["name"] for t in index.reps_for("37201")] == ["Ann Smith", "Bob Jones"]
+    assert index.reps_for("37203") is None
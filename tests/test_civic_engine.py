@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("streamlit")
+import civic_engine
+import civic_index
+
+def target(name, title):
+    return {"name": name, "title": title, "address_obj": civic_index.capitol_address(name, None, title == "U.S. Senator")}
+
+SENATORS = [target("Senator A", "U.S. Senator"), target("Senator B", "U.S. Senator")]
+REP = target("Rep Five", "U.S. Representative")
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    path = tmp_path / "civic_index.bin"
+    civic_index.write(str(path), {"37201": ["TN-05"], "37203": ["TN-05", "TN-07"]},
+                      {"TN-05": [REP]}, {"TN": SENATORS})
+    index = civic_index.Index(str(path))
+    db = {}
+    monkeypatch.setattr(civic_index, "get_index", lambda: index)
+    monkeypatch.setattr(civic_engine.database, "get_civic_cache", db.get)
+    monkeypatch.setattr(civic_engine.database, "put_civic_cache", lambda key, targets, ttl: db.__setitem__(key, targets))
+    monkeypatch.setattr(civic_engine, "_memory", civic_engine.OrderedDict())
+    monkeypatch.setattr(civic_engine, "_stats", dict.fromkeys(civic_engine._stats, 0))
+    monkeypatch.setattr(civic_engine, "API_KEY", None)
+    def no_geocode(query):
+        raise AssertionError(f"Geocodio called for {query!r}")
+    monkeypatch.setattr(civic_engine, "_geocode", no_geocode)
+    return db
+
+def test_single_district_zip_resolves_offline(engine):
+    reps = civic_engine.get_reps("1 Main St, Nashville, TN 37201")
+    assert [t["name"] for t in reps] == ["Senator A", "Senator B", "Rep Five"]
+    assert civic_engine.get_stats()["offline_hits"] == 1
+    assert engine == {}
+
+def test_ambiguous_zip_without_key_falls_back_to_senators(engine):
+    reps = civic_engine.get_reps("1 Main St, Nashville, TN 37203")
+    assert [t["name"] for t in reps] == ["Senator A", "Senator B"]
+    stats = civic_engine.get_stats()
+    assert stats["offline_ambiguous"] == 1 and stats["zip_fallbacks"] == 1
+
+def test_database_hit_is_promoted_to_memory(engine):
+    engine[civic_engine._address_key("9 Elm Street, Nashville, TN 37203")] = [REP]
+    assert civic_engine.get_reps("9 Elm Street, Nashville, TN 37203") == [REP]
+    assert civic_engine.get_reps("9 elm st., Nashville,  TN 37203") == [REP]
+    stats = civic_engine.get_stats()
+    assert stats["db_hits"] == 1 and stats["memory_hits"] == 1
+
+def test_address_key_abbreviates_the_street_only():
+    assert civic_engine._address_key("12 North Court Street, Court, TN 37201") == \
+        civic_engine._address_key("12 N Court St., court , tn 37201")
+
+def test_cached_targets_are_copies(engine):
+    civic_engine._cache_put("k", [REP])
+    civic_engine._cache_get("k")[0]["address_obj"]["street"] = "changed"
+    assert civic_engine._cache_get("k")[0]["address_obj"]["street"] == "United States Capitol"
+
+def test_memory_is_bounded(engine, monkeypatch):
+    monkeypatch.setattr(civic_engine, "MEMORY_ENTRIES", 2)
+    for key in ("a", "b", "c"):
+        civic_engine._remember(key, [])
+    assert list(civic_engine._memory) == ["b", "c"]
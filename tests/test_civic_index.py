@@ -0,0 +1,52 @@
+import pytest
+import civic_index
+
+def target(name, title):
+    return {"name": name, "title": title, "address_obj": civic_index.capitol_address(name, None, title == "U.S. Senator")}
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "civic_index.bin"
+    civic_index.write(
+        str(path),
+        {"37201": ["TN-05"], "37203": ["TN-05", "TN-07"], "00601": ["PR-00"]},
+        {"TN-05": [target("Rep Five", "U.S. Representative")], "PR-00": [target("Delegate", "U.S. Representative")]},
+        {"TN": [target("Senator A", "U.S. Senator"), target("Senator B", "U.S. Senator")]},
+        {"built": "test"},
+    )
+    return civic_index.Index(str(path))
+
+def test_single_district_zip(index):
+    assert index.districts_for("37201") == ["TN-05"]
+    assert [t["name"] for t in index.reps_for("37201")] == ["Senator A", "Senator B", "Rep Five"]
+
+def test_multi_district_zip_is_ambiguous(index):
+    assert index.districts_for("37203") == ["TN-05", "TN-07"]
+    assert index.reps_for("37203") is None
+
+def test_leading_zero_zip(index):
+    assert index.districts_for("00601") == ["PR-00"]
+    assert [t["name"] for t in index.reps_for("00601")] == ["Delegate"]
+
+@pytest.mark.parametrize("zip_code", ["99999", "00000", "abcde", ""])
+def test_unknown_zip(index, zip_code):
+    assert index.districts_for(zip_code) == []
+    assert index.reps_for(zip_code) is None
+
+def test_zip_plus_four(index):
+    assert index.districts_for("37201-1234") == ["TN-05"]
+
+def test_results_are_copies(index):
+    index.reps_for("37201")[0]["address_obj"]["street"] = "changed"
+    index.senators_for("TN").clear()
+    assert index.reps_for("37201")[0]["address_obj"]["street"] == "United States Capitol"
+    assert len(index.senators_for("TN")) == 2
+
+def test_stats(index):
+    assert index.stats() == {"zips": 3, "districts": 3, "source": {"built": "test"}}
+
+def test_capitol_address_splits_street_and_zip():
+    address = civic_index.capitol_address("Rep", "2458 Rayburn House Office Building Washington DC 20515-4205", False)
+    assert address["street"] == "2458 Rayburn House Office Building"
+    assert address["zip"] == "20515"
+    assert civic_index.capitol_address("Sen", "", True)["zip"] == "20510"
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("streamlit")
+import database
+
+def test_pool_config_defaults():
+    assert database._pool_config({"database_url": "postgresql://x"}) == database.POOL_DEFAULTS
+
+def test_pool_config_coerces_secrets_strings():
+    config = database._pool_config({"pool_size": "8", "pool_recycle": -1, "pool_pre_ping": "off"})
+    assert config["pool_size"] == 8
+    assert config["pool_recycle"] == -1
+    assert config["pool_pre_ping"] is False
+    assert config["max_overflow"] == database.POOL_DEFAULTS["max_overflow"]
+
+@pytest.mark.parametrize("key, value", [("pool_size", "eight"), ("pool_timeout", None), ("pool_pre_ping", "maybe")])
+def test_pool_config_rejects_bad_values(key, value):
+    with pytest.raises(ValueError, match=key):
+        database._pool_config({key: value})
+
+def test_missing_database_url_falls_back_to_sqlite(monkeypatch):
+    monkeypatch.setattr(database.st, "secrets", {})
+    assert database._build_engine().url.drivername == "sqlite"
+
+def test_bad_pool_setting_does_not_fall_back(monkeypatch):
+    monkeypatch.setattr(database.st, "secrets", {"connections": {"database_url": "sqlite://", "pool_size": "lots"}})
+    with pytest.raises(ValueError):
+        database._build_engine()
@@ -0,0 +1,83 @@
+import copy
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+import fpdf
+from fpdf import FPDF
+import font_registry
+
+@pytest.fixture(scope="module")
+def font_file(tmp_path_factory):
+    """A minimal TrueType font with a box glyph for A-Z and space."""
+    chars = [chr(c) for c in range(ord("A"), ord("Z") + 1)]
+    names = [".notdef", "space"] + chars
+    pen = TTGlyphPen(None)
+    pen.moveTo((50, 0))
+    pen.lineTo((50, 700))
+    pen.lineTo((450, 700))
+    pen.lineTo((450, 0))
+    pen.closePath()
+    box = pen.glyph()
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap({32: "space", **{ord(c): c for c in chars}})
+    empty = TTGlyphPen(None).glyph()
+    fb.setupGlyf({name: empty if name == "space" else box for name in names})
+    fb.setupHorizontalMetrics({name: (500, 50) for name in names})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": "Boxes", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    path = tmp_path_factory.mktemp("fonts") / "Boxes.ttf"
+    fb.save(str(path))
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(font_registry, "_templates", {})
+    monkeypatch.setattr(font_registry, "_stats", dict.fromkeys(font_registry._stats, 0))
+    monkeypatch.setattr(font_registry, "DISK_DIR", None)
+
+def document(font_file, text):
+    pdf = FPDF()
+    font_registry.add_font(pdf, "Boxes", "", font_file)
+    pdf.add_page()
+    pdf.set_font("Boxes", "", 12)
+    pdf.cell(0, 10, text)
+    return pdf
+
+def test_font_is_parsed_once_per_process(font_file):
+    first, second = document(font_file, "ABC"), document(font_file, "XYZ")
+    assert font_registry.get_stats() == {"parsed": 1, "disk_hits": 0, "reused": 2, "fonts": 1}
+    assert first.fonts["boxes"] is not second.fonts["boxes"]
+    assert first.fonts["boxes"].cw is second.fonts["boxes"].cw  # shared read-only metrics
+    assert bytes(first.output()).startswith(b"%PDF")
+    assert bytes(second.output()).startswith(b"%PDF")
+
+def test_adding_a_font_twice_is_a_no_op(font_file):
+    pdf = document(font_file, "A")
+    font = pdf.fonts["boxes"]
+    font_registry.add_font(pdf, "Boxes", "", font_file)
+    assert pdf.fonts["boxes"] is font and len(pdf.fonts) == 1
+
+def test_disk_tier_round_trip(font_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(font_registry, "DISK_DIR", str(tmp_path))
+    document(font_file, "A")
+    monkeypatch.setattr(font_registry, "_templates", {})
+    assert bytes(document(font_file, "B").output()).startswith(b"%PDF")
+    assert font_registry.get_stats()["disk_hits"] == 1
+
+def test_detached_copies_output_independently(font_file):
+    pdf = document(font_file, "ABC")
+    twin = copy.deepcopy(pdf)
+    font_registry.detach_fonts(twin)
+    twin.cell(0, 10, "XYZ")
+    assert twin.fonts["boxes"].ttfont is not pdf.fonts["boxes"].ttfont
+    assert bytes(pdf.output()).startswith(b"%PDF")
+    assert bytes(twin.output()).startswith(b"%PDF")
+
+def test_other_fpdf_releases_are_refused(font_file, monkeypatch):
+    monkeypatch.setattr(font_registry, "_compatible", False)
+    monkeypatch.setattr(fpdf, "__version__", "2.7.0")
+    with pytest.raises(font_registry.IncompatibleFPDF, match=font_registry.FPDF_VERSION):
+        font_registry.add_font(FPDF(), "Boxes", "", font_file)
@@ -0,0 +1,88 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from sqlalchemy import create_engine
+import database
+import mail_outbox
+
+TO = {"name": "Rep Five", "street": "1 Capitol", "city": "Washington", "state": "DC", "zip": "20515"}
+FROM = {"name": "Ann", "street": "1 Main St", "city": "Nashville", "state": "TN", "zip": "37201"}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "_engine", create_engine(f"sqlite:///{tmp_path / 'test.db'}"))
+    monkeypatch.setattr(database, "_session_factory", None)
+    monkeypatch.setattr(mail_outbox, "_schema_ready", False)
+    monkeypatch.setattr(mail_outbox, "start", lambda: None)
+    database.init_db()
+    session = database.get_session()
+    letter = database.Letter(content="Dear Rep", status="Queued")
+    session.add(letter)
+    session.commit()
+    letter_id = letter.id
+    session.close()
+    return letter_id
+
+def letter_status(letter_id):
+    return database.get_letter(letter_id).status
+
+def outbox_row(item_id):
+    session = database.get_session()
+    try:
+        return session.get(database.OutboxMail, item_id)
+    finally:
+        session.close()
+
+def send_with(monkeypatch, result):
+    sent = []
+    def fake_send(jobs):
+        sent.extend(jobs)
+        return [dict(result) for _ in jobs]
+    monkeypatch.setattr(mail_outbox.mailer, "send_letters", fake_send)
+    return sent
+
+def test_idempotency_key_is_stable():
+    key = mail_outbox.idempotency_key("session", 7, TO, "text")
+    assert key == mail_outbox.idempotency_key("session", 7, dict(reversed(TO.items())), "text")
+    assert key != mail_outbox.idempotency_key("session", 7, TO, "other text")
+    assert key.startswith("verbapost-")
+
+@pytest.mark.parametrize("attempts, low, high", [(1, 15, 30), (2, 30, 60), (20, 1800, 3600)])
+def test_backoff_doubles_with_jitter_and_caps(attempts, low, high):
+    for _ in range(20):
+        assert low <= mail_outbox.backoff(attempts) <= high
+
+def test_enqueue_twice_mails_once(db, monkeypatch):
+    first = mail_outbox.enqueue(b"%PDF", TO, FROM, "key-1", db)
+    assert mail_outbox.enqueue(b"%PDF", TO, FROM, "key-1", db) == first
+    assert letter_status(db) == "Mailing"
+    sent = send_with(monkeypatch, {"ok": True, "id": "ltr_1", "error": None, "retryable": False})
+    assert mail_outbox.drain_once() == 1
+    assert [job[3] for job in sent] == ["key-1"]
+    assert outbox_row(first).status == "sent" and outbox_row(first).lob_id == "ltr_1"
+    assert letter_status(db) == "Sent"
+    assert mail_outbox.drain_once() == 0
+
+def test_transient_failure_is_retried_later(db, monkeypatch):
+    item_id = mail_outbox.enqueue(b"%PDF", TO, FROM, "key-2", db)
+    send_with(monkeypatch, {"ok": False, "id": None, "error": "Lob 503", "retryable": True})
+    assert mail_outbox.drain_once() == 1
+    row = outbox_row(item_id)
+    assert (row.status, row.attempts, row.last_error) == ("pending", 1, "Lob 503")
+    assert mail_outbox.drain_once() == 0  # not due yet
+    assert letter_status(db) == "Mailing"
+
+def test_permanent_failure_can_be_retried_by_admin(db, monkeypatch):
+    item_id = mail_outbox.enqueue(b"%PDF", TO, FROM, "key-3", db)
+    send_with(monkeypatch, {"ok": False, "id": None, "error": "Lob 422: bad address", "retryable": False})
+    mail_outbox.drain_once()
+    assert letter_status(db) == "Mail Failed"
+    assert [item.last_error for item in database.get_failed_mail()] == ["Lob 422: bad address"]
+
+    assert mail_outbox.retry(item_id) is True
+    assert mail_outbox.retry(item_id) is False  # no longer failed
+    assert letter_status(db) == "Mailing"
+    send_with(monkeypatch, {"ok": True, "id": "ltr_3", "error": None, "retryable": False})
+    assert mail_outbox.drain_once() == 1
+    assert letter_status(db) == "Sent"
+    assert database.get_failed_mail() == []
@@ -0,0 +1,123 @@
+import pytest
+
+pytest.importorskip("streamlit")
+requests = pytest.importorskip("requests")
+import mailer
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(mailer.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(mailer.time, "sleep", fake.sleep)
+    return fake
+
+def test_rate_limiter_allows_a_full_bucket_then_waits(clock):
+    limiter = mailer._RateLimiter(3, 1.0)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.slept == []
+    limiter.acquire()
+    assert clock.slept == [pytest.approx(1 / 3)]
+
+def test_rate_limiter_refills_over_time(clock):
+    limiter = mailer._RateLimiter(2, 1.0)
+    limiter.acquire()
+    limiter.acquire()
+    clock.now += 1.0
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.slept == []
+
+@pytest.mark.parametrize("status, retryable", [(429, True), (500, True), (503, True), (400, False), (422, False)])
+def test_lob_error_retryable(status, retryable):
+    assert mailer.LobError(status, "x").retryable is retryable
+
+def test_map_address_accepts_both_key_styles():
+    short = {"name": "Ann", "street": "1 Main St", "city": "Nashville", "state": "TN", "zip": "37201"}
+    lob = mailer.map_address(short)
+    assert lob == {"name": "Ann", "address_line1": "1 Main St", "address_city": "Nashville",
+                   "address_state": "TN", "address_zip": "37201"}
+    assert mailer.map_address(lob) == lob
+
+def test_send_letters_keeps_order_and_maps_failures(monkeypatch):
+    def fake_create(pdf, to_address, from_address, idempotency_key=None):
+        if pdf == "rejected":
+            raise mailer.LobError(422, "bad address")
+        if pdf == "timeout":
+            raise requests.Timeout("read timed out")
+        return {"id": f"ltr_{pdf}", "key": idempotency_key}
+    monkeypatch.setattr(mailer, "_create_letter", fake_create)
+
+    results = mailer.send_letters([("a", {}, {}, "key-a"), ("rejected", {}, {}), ("timeout", {}, {}), ("b", {}, {})])
+    assert [r["ok"] for r in results] == [True, False, False, True]
+    assert results[0]["id"] == "ltr_a" and results[0]["response"]["key"] == "key-a"
+    assert results[1]["retryable"] is False and "422" in results[1]["error"]
+    assert results[2]["retryable"] is True
+    assert results[3]["id"] == "ltr_b"
+
+@pytest.mark.parametrize("line, expected", [
+    ("123 North Court Street", "123 N COURT ST"),
+    ("123 North Ave", "123 NORTH AVE"),
+    ("45 West St Apartment 4B", "45 WEST ST APT 4B"),
+    ("9 Main Street Northwest", "9 MAIN ST NW"),
+    ("1 Park Avenue Suite 200", "1 PARK AVE STE 200"),
+    ("77 Court Street", "77 COURT ST"),
+    ("P.O. Box 12", "PO BOX 12"),
+    ("  12  elm   st. ", "12 ELM ST"),
+])
+def test_normalize_street(line, expected):
+    assert mailer.normalize_street(line) == expected
+
+@pytest.mark.parametrize("value, expected", [
+    ("37201", "37201"), ("372011234", "37201-1234"), ("37201 1234", "37201-1234"),
+    ("00601", "00601"), ("n/a", "n/a"),
+])
+def test_normalize_zip(value, expected):
+    assert mailer.normalize_zip(value) == expected
+
+def test_two_spellings_normalize_the_same():
+    a = mailer.normalize_address({"name": "Ann  Lee", "street": "12 Elm Street, Apt. 3", "city": "nashville",
+                                  "state": "Tennessee", "zip": "37201-1234"})
+    b = mailer.normalize_address({"name": "Ann Lee", "address_line1": "12 ELM ST APARTMENT 3",
+                                  "address_city": "Nashville", "address_state": "TN", "address_zip": "372011234"})
+    assert a == b == {"name": "Ann Lee", "address_line1": "12 ELM ST APT 3", "address_city": "NASHVILLE",
+                      "address_state": "TN", "address_zip": "37201-1234"}
+
+def test_verify_address_without_a_key_never_calls_lob(monkeypatch):
+    def fail(norm):
+        raise AssertionError("Lob called without an API key")
+    monkeypatch.setattr(mailer, "API_KEY", None)
+    monkeypatch.setattr(mailer, "_lob_verify", fail)
+    result = mailer.verify_address({"name": "Ann", "street": "1 Main St", "city": "Nashville", "state": "TN", "zip": "37201"})
+    assert result["ok"] is True
+    assert result["deliverability"] == "unverified"
+    assert result["address"]["address_line1"] == "1 MAIN ST"
+
+def test_verify_address_caches_by_address_not_name(monkeypatch):
+    calls = []
+    def fake_verify(norm):
+        calls.append(norm)
+        return {"deliverability": "deliverable", "primary_line": "1 MAIN ST",
+                "components": {"city": "NASHVILLE", "state": "TN", "zip_code": "37201", "zip_code_plus_4": "1234"}}
+    monkeypatch.setattr(mailer, "API_KEY", "test_key")
+    monkeypatch.setattr(mailer, "_lob_verify", fake_verify)
+    monkeypatch.setattr(mailer, "_verify_cache", mailer.OrderedDict())
+    addr = {"name": "Ann", "street": "1 Main Street", "city": "Nashville", "state": "TN", "zip": "37201"}
+    first = mailer.verify_address(addr)
+    second = mailer.verify_address({**addr, "name": "Bob", "street": "1 main st."})
+    assert len(calls) == 1
+    assert first["cached"] is False and second["cached"] is True
+    assert second["address"]["address_zip"] == "37201-1234"
+    assert second["address"]["name"] == "Bob"
@@ -0,0 +1,36 @@
+import os
+import pytest
+import pdf_cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+def test_key_covers_every_printed_part():
+    key = pdf_cache.cache_key(7, 3, "Dear Sir", "English", "2026-10-01")
+    assert key.startswith("7_3_")
+    assert key == pdf_cache.cache_key(7, 3, "Dear Sir", "English", "2026-10-01")
+    assert key != pdf_cache.cache_key(7, 3, "Dear Sir", "English", "2026-10-02")
+    assert key != pdf_cache.cache_key(7, 4, "Dear Sir", "English", "2026-10-01")
+    # Parts are delimited, not concatenated
+    assert pdf_cache.cache_key(1, 1, "ab", "c") != pdf_cache.cache_key(1, 1, "a", "bc")
+
+def test_get_or_render_renders_once():
+    calls = []
+    def render():
+        calls.append(1)
+        return b"%PDF-1.4 letter"
+    assert pdf_cache.get_or_render("k", render) == b"%PDF-1.4 letter"
+    assert pdf_cache.get_or_render("k", render) == b"%PDF-1.4 letter"
+    assert len(calls) == 1
+    assert pdf_cache.get("missing") is None
+
+def test_evicts_least_recently_used(cache_dir, monkeypatch):
+    for i, key in enumerate(("old", "used", "new")):
+        pdf_cache.put(key, b"x" * 10)
+        os.utime(cache_dir / f"{key}.pdf", (1000 + i, 1000 + i))
+    monkeypatch.setattr(pdf_cache, "MAX_CACHE_BYTES", 25)
+    pdf_cache.get("old")  # touching it makes "used" the oldest
+    pdf_cache._evict()
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["new.pdf", "old.pdf"]
@@ -0,0 +1,27 @@
+import pytest
+import ai_engine
+
+@pytest.mark.parametrize("text, language, expected", [
+    ("I I think um the plan works", "English", "I think the plan works"),
+    ("Um, the umbrella is in Utah", "English", "the umbrella is in Utah"),
+    ("Er, the error was ER visit", "English", "the error was ER visit"),
+    ("Well, uh, like, you know, fine", "English", "Well, fine"),
+    ("It was, you know, fine", "English", "It was fine"),
+    ("Do you know where he went?", "English", "Do you know where he went?"),
+    ("I agree, um.", "English", "I agree."),
+    ("Room 11 11 is free", "English", "Room 11 11 is free"),
+    ("He had had enough", "English", "He had had enough"),
+    ("今日はえっと天気", "Japanese", "今日は天気"),
+    ("今日は、えっと、天気", "Japanese", "今日は、天気"),
+    ("我觉得嗯这个很好", "Chinese", "我觉得这个很好"),
+    ("음 저는 음식을 좋아해요", "Korean", "저는 음식을 좋아해요"),
+])
+def test_polish_text(text, language, expected):
+    assert ai_engine.polish_text(text, language) == expected
+
+def test_polish_texts_matches_polish_text():
+    texts = ["um hello hello", "Do you know?"]
+    assert ai_engine.polish_texts(texts) == [ai_engine.polish_text(t) for t in texts]
+
+def test_unknown_language_uses_english_fillers():
+    assert ai_engine.polish_text("uh hi", "Klingon") == "hi"
@@ -0,0 +1,40 @@
+import pytest
+import prerender
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(prerender, "_timers", {})
+    monkeypatch.setattr(prerender, "_renders", type(prerender._renders)())
+
+def test_render_key_covers_bytes_and_none():
+    assert prerender.render_key("a", b"\x00sig", None) == prerender.render_key("a", b"\x00sig", None)
+    assert prerender.render_key("a", b"sig") != prerender.render_key("a", b"sig2")
+    # Part boundaries matter: ("ab", "c") is not ("a", "bc")
+    assert prerender.render_key("ab", "c") != prerender.render_key("a", "bc")
+
+def test_take_returns_the_scheduled_render():
+    prerender.schedule("session", "k", lambda text: text.upper(), "hello", delay=0)
+    assert prerender.take("k", timeout=5) == "HELLO"
+    assert prerender.take("k", timeout=5) is None  # a taken result is gone
+
+def test_take_starts_a_render_that_is_still_debouncing():
+    prerender.schedule("session", "k", lambda: "pdf", delay=60)
+    assert prerender.take("k", timeout=5) == "pdf"
+
+def test_newer_edit_supersedes_the_pending_render():
+    calls = []
+    render = lambda text: calls.append(text) or text
+    prerender.schedule("session", "old", render, "old", delay=60)
+    prerender.schedule("session", "new", render, "new", delay=60)
+    assert prerender.take("old", timeout=5) is None
+    assert prerender.take("new", timeout=5) == "new"
+    assert calls == ["new"]
+
+def test_failed_render_is_a_miss():
+    def boom():
+        raise RuntimeError("render failed")
+    prerender.schedule("session", "k", boom, delay=0)
+    assert prerender.take("k", timeout=5) is None
+
+def test_unknown_key_is_a_miss():
+    assert prerender.take("nothing", timeout=0) is None
@@ -0,0 +1,37 @@
+import re
+from datetime import datetime
+import letter_format
+
+def page_count(pdf_bytes):
+    return len(re.findall(rb"/Type /Page\b(?!s)", pdf_bytes))
+
+def letters(n):
+    for i in range(n):
+        yield (f"Letter {i}", f"Recipient {i}\n1 Main St", "Sender\n2 Oak Ave", "English", datetime(2026, 1, i + 1))
+
+def test_one_page_per_letter_in_order():
+    data = letter_format.create_print_batch(letters(3), as_bytes=True)
+    assert data.startswith(b"%PDF")
+    assert page_count(data) == 3
+
+def test_rows_without_language_or_date():
+    data = letter_format.create_print_batch([("Hi", "To", "From")], as_bytes=True)
+    assert page_count(data) == 1
+
+def test_empty_batch_is_a_blank_document():
+    assert page_count(letter_format.create_print_batch([], as_bytes=True)) == 1
+
+def test_batches_stream_to_bounded_parts(tmp_path):
+    written_before = []
+    def rows():
+        for i, row in enumerate(letters(5)):
+            # Part 1 is on disk before the third letter is even read
+            written_before.append(len(list(tmp_path.iterdir())))
+            yield row
+    paths = letter_format.create_print_batches(rows(), tmp_path, chunk_size=2)
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["print_batch_001.pdf", "print_batch_002.pdf", "print_batch_003.pdf"]
+    assert [page_count(open(p, "rb").read()) for p in paths] == [2, 2, 1]
+    assert written_before == [0, 0, 1, 1, 2]
+
+def test_no_letters_no_parts(tmp_path):
+    assert letter_format.create_print_batches(iter([]), tmp_path) == []
@@ -0,0 +1,43 @@
+import io
+import numpy as np
+from PIL import Image
+import signature_image
+
+def canvas(h=100, w=200):
+    return np.zeros((h, w, 4), dtype=np.uint8)  # transparent
+
+def test_ink_mask_composites_over_white():
+    data = canvas(2, 3)
+    data[0, 0] = (0, 0, 0, 255)      # opaque black: ink
+    data[0, 1] = (0, 0, 0, 40)       # faint stroke: paper
+    data[0, 2] = (255, 255, 255, 255)
+    assert signature_image.ink_mask(data).tolist() == [[True, False, False], [False, False, False]]
+
+def test_crop_box_pads_and_clamps():
+    mask = np.zeros((20, 30), dtype=bool)
+    mask[1:3, 10:15] = True
+    assert signature_image.crop_box(mask, padding=4) == (0, 7, 6, 19)
+    assert signature_image.crop_box(np.zeros((5, 5), dtype=bool)) is None
+
+def test_compact_crops_to_one_bit_png():
+    data = canvas()
+    data[40:50, 60:140] = (0, 0, 0, 255)
+    png = signature_image.compact(data)
+    pad = signature_image.PADDING
+    assert signature_image.png_size(png) == (80 + 2 * pad, 10 + 2 * pad)
+    img = Image.open(io.BytesIO(png))
+    assert img.mode == "1"
+    assert img.getpixel((pad, pad)) == 0 and img.getpixel((0, 0)) == 255
+
+def test_blank_canvas_is_none():
+    assert signature_image.compact(canvas()) is None
+    assert signature_image.compact(None) is None
+
+def test_compact_caches_by_content():
+    data = canvas()
+    data[10:20, 10:20] = (0, 0, 0, 255)
+    before = signature_image.get_stats()
+    first = signature_image.compact(data)
+    assert signature_image.compact(data.copy()) == first
+    after = signature_image.get_stats()
+    assert (after["misses"] - before["misses"], after["hits"] - before["hits"]) == (1, 1)
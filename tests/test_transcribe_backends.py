@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import ai_engine
+import audio_processing
+import transcribe_backends
+
+class FakeBackend:
+    def __init__(self, concurrent):
+        self.concurrent = concurrent
+        self.lengths = []
+
+    def transcribe(self, audio, **options):
+        self.lengths.append(len(audio))
+        return "words"
+
+@pytest.fixture
+def local_only(monkeypatch):
+    """Route _run_transcription to a fake local backend (no shared service)."""
+    monkeypatch.setattr(ai_engine.transcribe_service, "is_available", lambda: False)
+    def use(backend):
+        monkeypatch.setattr(ai_engine, "get_backend", lambda tier=None: backend)
+        return backend
+    return use
+
+def long_recording():
+    seconds = ai_engine.CHUNKED_MIN_SECONDS + 10
+    t = np.arange(seconds * audio_processing.SAMPLE_RATE, dtype=np.float32) / audio_processing.SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+def test_serial_backend_gets_one_call(local_only):
+    backend = local_only(FakeBackend(concurrent=False))
+    audio = long_recording()
+    assert ai_engine._run_transcription(audio) == "words"
+    assert backend.lengths == [len(audio)]
+
+def test_concurrent_backend_gets_chunks(local_only, monkeypatch):
+    monkeypatch.setattr(ai_engine, "CHUNK_WORKERS", 2)
+    backend = local_only(FakeBackend(concurrent=True))
+    audio = long_recording()
+    assert ai_engine._run_transcription(audio) == " ".join(["words"] * len(backend.lengths))
+    assert len(backend.lengths) > 1 and sum(backend.lengths) == len(audio)
+    assert max(backend.lengths) <= ai_engine.CHUNK_SECONDS * audio_processing.SAMPLE_RATE
+
+def test_no_backend_is_none(local_only):
+    local_only(None)
+    assert ai_engine._run_transcription(np.zeros(100, dtype=np.float32)) is None
+
+def test_backends_declare_whether_calls_may_overlap():
+    assert transcribe_backends.WhisperBackend.concurrent is False
+    assert transcribe_backends.FasterWhisperBackend.concurrent is True
+
+def test_tiers_map_to_model_sizes():
+    assert transcribe_backends.model_size_for_tier(None) == transcribe_backends.DEFAULT_MODEL_SIZE
+    assert transcribe_backends.model_size_for_tier("Heirloom") == transcribe_backends.TIER_MODEL_SIZES["Heirloom"]
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown transcription backend"):
+        transcribe_backends.get_backend("cloud")
+
+@pytest.mark.parametrize("language, expected", [
+    ("Japanese", {"task": "transcribe", "language": "ja"}),
+    ("ko", {"task": "transcribe", "language": "ko"}),
+    ("Klingon", {"task": "transcribe"}),
+    (None, {"task": "transcribe"}),
+])
+def test_whisper_options_skip_detection_for_known_languages(language, expected):
+    assert ai_engine.whisper_options(language) == expected
+
+def test_language_reaches_the_model_and_the_cache_key(local_only, monkeypatch):
+    monkeypatch.setattr(ai_engine.transcript_cache, "_memory", type(ai_engine.transcript_cache._memory)())
+    monkeypatch.setattr(ai_engine.transcript_cache, "DISK_DIR", None)
+    calls = []
+    class Recorder(FakeBackend):
+        def transcribe(self, audio, **options):
+            calls.append(options)
+            return f"text/{options.get('language')}"
+    local_only(Recorder(concurrent=False))
+    audio = long_recording()[:audio_processing.SAMPLE_RATE * 2]
+    assert ai_engine.transcribe_audio(audio, language="Japanese") == "text/ja"
+    assert ai_engine.transcribe_audio(audio, language="Korean") == "text/ko"
+    assert ai_engine.transcribe_audio(audio, language="Japanese") == "text/ja"  # cached
+    assert calls == [{"task": "transcribe", "language": "ja"}, {"task": "transcribe", "language": "ko"}]
@@ -0,0 +1,46 @@
+import threading
+import time
+import transcribe_jobs
+
+def wait(job_id, timeout=5):
+    deadline = time.time() + timeout
+    while transcribe_jobs.get(job_id).pending:
+        assert time.time() < deadline, "job never finished"
+        time.sleep(0.01)
+    return transcribe_jobs.get(job_id)
+
+class Recording:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_job_runs_in_background_and_closes_audio(monkeypatch):
+    release = threading.Event()
+    def transcribe(audio, **kwargs):
+        release.wait(5)
+        return f"text in {kwargs['language']}"
+    monkeypatch.setattr(transcribe_jobs.ai_engine, "transcribe_audio", transcribe)
+    audio = Recording()
+    job_id = transcribe_jobs.submit(audio, audio_id="abc", language="English")
+    assert transcribe_jobs.get(job_id).pending
+    release.set()
+    job = wait(job_id)
+    assert (job.status, job.result, job.audio_id) == ("done", "text in English", "abc")
+    assert audio.closed
+    assert job.elapsed >= 0
+
+def test_job_records_errors(monkeypatch):
+    def transcribe(audio, **kwargs):
+        raise RuntimeError("model unavailable")
+    monkeypatch.setattr(transcribe_jobs.ai_engine, "transcribe_audio", transcribe)
+    job = wait(transcribe_jobs.submit(b"audio"))
+    assert (job.status, job.error, job.result) == ("error", "model unavailable", None)
+
+def test_finished_jobs_expire(monkeypatch):
+    monkeypatch.setattr(transcribe_jobs.ai_engine, "transcribe_audio", lambda audio, **kwargs: "ok")
+    old = wait(transcribe_jobs.submit(b"audio"))
+    old.finished -= transcribe_jobs.JOB_TTL + 1
+    transcribe_jobs.submit(b"audio")
+    assert transcribe_jobs.get(old.id) is None
+    assert transcribe_jobs.get("unknown") is None
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing.connection import Listener
+import numpy as np
+import pytest
+import ai_engine
+import transcribe_backends
+import transcribe_service
+
+@pytest.fixture
+def serve():
+    """serve(reply, authkey) -> socket path of a stand-in service answering one request."""
+    # Short path: AF_UNIX socket names are limited to ~100 bytes
+    socket_dir = tempfile.mkdtemp(prefix="vp-")
+    os.chmod(socket_dir, 0o700)
+    listeners = []
+    def start(reply, authkey=b"secret"):
+        path = os.path.join(socket_dir, "whisper.sock")
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(path, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(old_umask)
+        listeners.append(listener)
+        def run():
+            try:
+                with listener.accept() as conn:
+                    conn.recv()
+                    conn.send(reply)
+            except Exception:
+                pass
+        threading.Thread(target=run, daemon=True).start()
+        return path
+    yield start
+    for listener in listeners:
+        listener.close()
+    shutil.rmtree(socket_dir, ignore_errors=True)
+
+def test_round_trip(serve, monkeypatch):
+    monkeypatch.setattr(transcribe_service, "AUTHKEY", b"secret")
+    path = serve({"text": "hello"})
+    assert transcribe_service.transcribe(np.zeros(10, dtype=np.float32), socket_path=path) == "hello"
+
+def test_error_reply_is_a_service_error(serve, monkeypatch):
+    monkeypatch.setattr(transcribe_service, "AUTHKEY", b"secret")
+    path = serve({"error": "CUDA out of memory"})
+    with pytest.raises(transcribe_service.ServiceError, match="out of memory"):
+        transcribe_service.transcribe(np.zeros(10, dtype=np.float32), socket_path=path)
+
+def test_wrong_authkey_is_a_service_error(serve, monkeypatch):
+    monkeypatch.setattr(transcribe_service, "AUTHKEY", b"wrong")
+    path = serve({"text": "never sent"})
+    with pytest.raises(transcribe_service.ServiceError, match="authkey"):
+        transcribe_service.transcribe(np.zeros(10, dtype=np.float32), socket_path=path)
+
+def test_unavailable_without_authkey_or_private_socket(serve, monkeypatch):
+    path = serve({"text": ""})
+    monkeypatch.setattr(transcribe_service, "AUTHKEY", None)
+    assert not transcribe_service.is_available(path)
+    monkeypatch.setattr(transcribe_service, "AUTHKEY", b"secret")
+    assert transcribe_service.is_available(path)
+    os.chmod(os.path.dirname(path), 0o755)
+    assert not transcribe_service.is_available(path)
+    with pytest.raises(ConnectionError):
+        transcribe_service.transcribe(np.zeros(10, dtype=np.float32), socket_path=path)
+
+class LocalBackend:
+    concurrent = False
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options)
+        return "local text"
+
+@pytest.mark.parametrize("error", [
+    ConnectionError("socket gone"),
+    transcribe_service.ServiceError("worker crashed"),
+])
+def test_service_failures_fall_back_to_the_local_model(monkeypatch, error):
+    def failing_service(audio, **options):
+        raise error
+    backend = LocalBackend()
+    monkeypatch.setattr(transcribe_backends, "DEFAULT_BACKEND", "whisper")
+    monkeypatch.setattr(transcribe_service, "is_available", lambda: True)
+    monkeypatch.setattr(transcribe_service, "transcribe", failing_service)
+    monkeypatch.setattr(ai_engine, "get_backend", lambda tier=None: backend)
+    monkeypatch.setattr(transcribe_backends, "model_size_for_tier", lambda tier=None: transcribe_service.MODEL_NAME)
+    text = ai_engine._run_transcription(np.zeros(16000, dtype=np.float32), options={"language": "en"})
+    assert text == "local text"
+    assert backend.calls == [{"language": "en"}]
@@ -0,0 +1,46 @@
+import json
+import os
+import time
+import pytest
+import transcript_cache
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(transcript_cache, "_memory", type(transcript_cache._memory)())
+    monkeypatch.setattr(transcript_cache, "DISK_DIR", None)
+
+def test_key_covers_everything_that_changes_the_output():
+    base = transcript_cache.make_key("abc", "whisper:base", "en", task="transcribe")
+    assert base == transcript_cache.make_key("abc", "whisper:base", "en", task="transcribe")
+    assert base != transcript_cache.make_key("abd", "whisper:base", "en", task="transcribe")
+    assert base != transcript_cache.make_key("abc", "whisper:small", "en", task="transcribe")
+    assert base != transcript_cache.make_key("abc", "whisper:base", "ja", task="transcribe")
+    assert base != transcript_cache.make_key("abc", "whisper:base", "en", task="translate")
+
+def test_memory_round_trip():
+    assert transcript_cache.get("k") is None
+    transcript_cache.put("k", "hello")
+    assert transcript_cache.get("k") == "hello"
+
+def test_memory_is_lru_bounded(monkeypatch):
+    monkeypatch.setattr(transcript_cache, "MEMORY_ENTRIES", 2)
+    transcript_cache.put("a", "1")
+    transcript_cache.put("b", "2")
+    transcript_cache.get("a")  # a is now the most recent
+    transcript_cache.put("c", "3")
+    assert transcript_cache.get("b") is None
+    assert transcript_cache.get("a") == "1"
+    assert transcript_cache.get("c") == "3"
+
+def test_disk_tier_survives_memory_loss(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, "DISK_DIR", str(tmp_path))
+    transcript_cache.put("k", "from disk")
+    transcript_cache._memory.clear()
+    assert transcript_cache.get("k") == "from disk"
+
+def test_expired_disk_entries_are_dropped(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, "DISK_DIR", str(tmp_path))
+    with open(tmp_path / "k.json", "w", encoding="utf-8") as f:
+        json.dump({"text": "stale", "created": time.time() - transcript_cache.DISK_TTL - 1}, f)
+    assert transcript_cache.get("k") is None
+    assert not os.path.exists(tmp_path / "k.json")
@@ -0,0 +1,91 @@
+"""
+Speech-to-text engines behind ai_engine.transcribe_audio.
+
+  whisper         openai-whisper, float32 on CPU (original behaviour)
+  faster-whisper  CTranslate2 engine, int8-quantized weights on CPU
+
+Select with VERBAPOST_TRANSCRIBE_BACKEND; compare them with bench_backends.py.
+"""
+import os
+import threading
+
+SAMPLE_RATE = 16000
+DEFAULT_BACKEND = os.environ.get("VERBAPOST_TRANSCRIBE_BACKEND", "whisper")
+DEFAULT_MODEL_SIZE = os.environ.get("VERBAPOST_WHISPER_MODEL", "base")
+# Concurrent transcriptions per loaded model (threads sharing its weights, not copies)
+CHUNK_WORKERS = max(1, int(os.environ.get("VERBAPOST_CHUNK_WORKERS", "2")))
+
+# Model size per service tier (Heirloom letters are kept, so spend more CPU on them)
+TIER_MODEL_SIZES = {
+    "Standard": DEFAULT_MODEL_SIZE,
+    "Heirloom": os.environ.get("VERBAPOST_HEIRLOOM_MODEL", DEFAULT_MODEL_SIZE),
+    "Civic": DEFAULT_MODEL_SIZE,
+}
+
+class WhisperBackend:
+    name = "whisper"
+    concurrent = False
+
+    def __init__(self, model_size, threads=None):
+        import torch
+        import whisper
+        if threads:
+            torch.set_num_threads(threads)
+        self._whisper = whisper
+        self.model_size = model_size
+        self.model = whisper.load_model(model_size, device="cpu")
+        # transcribe() installs kv-cache hooks on the model, so calls can't overlap
+        self._lock = threading.Lock()
+
+    def load_audio(self, path):
+        return self._whisper.load_audio(path)
+
+    def transcribe(self, audio, **options):
+        with self._lock:
+            return self.model.transcribe(audio, fp16=False, **options)["text"]
+
+class FasterWhisperBackend:
+    name = "faster-whisper"
+    concurrent = True
+
+    def __init__(self, model_size, threads=None, compute_type="int8", workers=CHUNK_WORKERS):
+        from faster_whisper import WhisperModel
+        import faster_whisper
+        self._decode_audio = faster_whisper.decode_audio
+        self.model_size = model_size
+        self.model = WhisperModel(
+            model_size, device="cpu", compute_type=compute_type, cpu_threads=threads or 0,
+            num_workers=workers
+        )
+
+    def load_audio(self, path):
+        return self._decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+    def transcribe(self, audio, **options):
+        segments, _info = self.model.transcribe(audio, beam_size=5, **options)
+        return "".join(segment.text for segment in segments)
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+def model_size_for_tier(tier=None):
+    return TIER_MODEL_SIZES.get(tier, DEFAULT_MODEL_SIZE)
+
+def get_backend(name=None, model_size=None):
+    """Loads each (backend, model size) once per process."""
+    name = name or DEFAULT_BACKEND
+    model_size = model_size or DEFAULT_MODEL_SIZE
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    key = (name, model_size)
+    if key not in _loaded:
+        with _lock:
+            if key not in _loaded:
+                print(f"🧠 Loading {name} '{model_size}'...")
+                _loaded[key] = BACKENDS[name](model_size)
+    return _loaded[key]
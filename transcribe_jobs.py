@@ -0,0 +1,87 @@
+"""
+Background transcription jobs.
+
+The pool is owned by the server process (module state survives Streamlit
+reruns), so a session submits a recording, stores the job id, and picks the
+result up on a later rerun instead of blocking its script thread.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import ai_engine
+
+# --- CONFIG ---
+MAX_WORKERS = int(os.environ.get("VERBAPOST_TRANSCRIBE_WORKERS", os.cpu_count() or 2))
+JOB_TTL = 3600  # seconds a finished job is kept for pick-up
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="transcribe")
+_jobs = {}
+_lock = threading.Lock()
+
+class Job:
+    def __init__(self, audio_id):
+        self.id = uuid.uuid4().hex
+        self.audio_id = audio_id
+        self.status = "queued"  # queued -> running -> done | error
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.submitted
+
+    @property
+    def pending(self):
+        return self.status in ("queued", "running")
+
+def _run(job, audio, kwargs):
+    job.status = "running"
+    job.started = time.time()
+    try:
+        job.result = ai_engine.transcribe_audio(audio, **kwargs)
+        job.status = "done"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "error"
+    finally:
+        job.finished = time.time()
+        if hasattr(audio, "close"):
+            audio.close()
+
+def _prune():
+    # caller holds _lock
+    cutoff = time.time() - JOB_TTL
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished < cutoff]:
+        del _jobs[job_id]
+
+def submit(audio, audio_id=None, **kwargs):
+    """
+    Queues ai_engine.transcribe_audio(audio, **kwargs) and returns the job id.
+    The job takes ownership of `audio` and closes it when done.
+    """
+    job = Job(audio_id)
+    with _lock:
+        _prune()
+        _jobs[job.id] = job
+    _executor.submit(_run, job, audio, kwargs)
+    return job.id
+
+def get(job_id):
+    """The Job, or None if it is unknown or has expired."""
+    with _lock:
+        return _jobs.get(job_id)
+
+def get_stats():
+    with _lock:
+        statuses = [j.status for j in _jobs.values()]
+    return {
+        "workers": MAX_WORKERS,
+        "queued": statuses.count("queued"),
+        "running": statuses.count("running"),
+        "finished": statuses.count("done") + statuses.count("error"),
+    }
@@ -0,0 +1,256 @@
+"""
+Shared Whisper transcription service.
+
+Run one per host:  python transcribe_service.py [model_name]
+
+The service owns the only copy of the model and listens on a Unix socket.
+Every Streamlit worker talks to it through transcribe() below instead of
+loading its own model. Requests that arrive together are batched: clips that
+fit in Whisper's 30s window are decoded in one forward pass, longer clips go
+through model.transcribe one at a time.
+"""
+import os
+import queue
+import stat
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# --- CONFIG ---
+# Messages are pickled, so the socket must only be reachable by us: it lives
+# in a 0700 directory owned by this user, and both ends must share a secret
+# authkey (no default - the service refuses to run or connect without one).
+RUNTIME_DIR = os.environ.get("VERBAPOST_WHISPER_DIR") or os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"verbapost-{os.geteuid()}"
+)
+SOCKET_PATH = os.environ.get("VERBAPOST_WHISPER_SOCKET") or os.path.join(RUNTIME_DIR, "whisper.sock")
+AUTHKEY = os.environ.get("VERBAPOST_WHISPER_AUTHKEY", "").encode() or None
+MODEL_NAME = os.environ.get("VERBAPOST_WHISPER_MODEL", "base")
+MAX_BATCH = 8
+BATCH_WINDOW = 0.05  # seconds to wait for more clips before decoding a batch
+SAMPLE_RATE = 16000
+SHORT_CLIP_SECONDS = 30
+
+# ==========================================
+#  CLIENT
+# ==========================================
+def _private(path, kind):
+    """True if path is a `kind` (stat.S_ISDIR/S_ISSOCK) owned by us and closed to group/others."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return kind(st.st_mode) and st.st_uid == os.geteuid() and not st.st_mode & 0o077
+
+def _secure_dir(path):
+    """Creates the socket directory 0700, or raises if an existing one isn't ours and private."""
+    try:
+        os.makedirs(path, mode=0o700)
+    except FileExistsError:
+        pass
+    if not _private(path, stat.S_ISDIR):
+        raise PermissionError(f"{path} must be a directory owned by this user with mode 0700")
+
+class ServiceError(RuntimeError):
+    """The service was reached but refused or failed the request (bad authkey, worker error)."""
+
+def is_available(socket_path=SOCKET_PATH):
+    return (AUTHKEY is not None
+            and _private(os.path.dirname(socket_path), stat.S_ISDIR)
+            and _private(socket_path, stat.S_ISSOCK))
+
+def _request(message, socket_path=SOCKET_PATH):
+    if not is_available(socket_path):
+        raise ConnectionError("Transcription service unavailable: no authkey or no private socket")
+    try:
+        conn = Client(socket_path, family="AF_UNIX", authkey=AUTHKEY)
+    except AuthenticationError as e:
+        raise ServiceError(f"Transcription service rejected our authkey: {e}")
+    except (OSError, EOFError) as e:
+        raise ConnectionError(f"Transcription service unavailable: {e}")
+    try:
+        conn.send(message)
+        reply = conn.recv()
+    except (OSError, EOFError) as e:
+        raise ConnectionError(f"Transcription service dropped the request: {e}")
+    finally:
+        conn.close()
+    if "error" in reply:
+        raise ServiceError(reply["error"])
+    return reply
+
+def transcribe(audio, socket_path=SOCKET_PATH, **options):
+    """
+    Transcribes a file path or 16 kHz mono float32 samples through the shared
+    service. Raises ConnectionError if it is not running, ServiceError if it
+    refused or failed the request.
+    """
+    if isinstance(audio, str):
+        audio = os.path.abspath(audio)
+    reply = _request({"op": "transcribe", "audio": audio, "options": options}, socket_path)
+    return reply["text"]
+
+def get_status(socket_path=SOCKET_PATH):
+    """Queue depth and throughput counters from the running service."""
+    return _request({"op": "status"}, socket_path)
+
+# ==========================================
+#  SERVER
+# ==========================================
+class _Job:
+    def __init__(self, audio, options):
+        self.audio = audio
+        self.options = options
+        self.done = threading.Event()
+        self.reply = None
+
+class TranscriptionServer:
+    def __init__(self, model_name=MODEL_NAME, socket_path=SOCKET_PATH):
+        import whisper
+        import torch
+
+        torch.set_num_threads(os.cpu_count() or 1)
+        print(f"🧠 Loading Whisper '{model_name}'...")
+        self.whisper = whisper
+        self.torch = torch
+        self.model = whisper.load_model(model_name)
+        self.model_name = model_name
+        self.socket_path = socket_path
+        self.jobs = queue.Queue()
+        self.in_flight = 0
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "batched_clips": 0, "errors": 0, "busy_seconds": 0.0}
+
+    # --- batching loop ---
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _decode_short(self, jobs, audios):
+        """One batched forward pass for clips that fit in a single 30s window."""
+        whisper, torch = self.whisper, self.torch
+        # Batch only jobs that share decoding options
+        groups = {}
+        for job, audio in zip(jobs, audios):
+            groups.setdefault(tuple(sorted(job.options.items())), []).append((job, audio))
+
+        for opts, members in groups.items():
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels)
+                for _, audio in members
+            ]).to(self.model.device)
+            options = whisper.DecodingOptions(fp16=False, **dict(opts))
+            results = whisper.decode(self.model, mels, options)
+            for (job, _), result in zip(members, results):
+                job.reply = {"text": result.text}
+
+    def _run_batch(self, batch):
+        start = time.perf_counter()
+        short_jobs, short_audio = [], []
+        for job in batch:
+            try:
+                if isinstance(job.audio, str):
+                    audio = self.whisper.load_audio(job.audio)
+                else:
+                    audio = job.audio
+                if len(audio) <= SHORT_CLIP_SECONDS * SAMPLE_RATE:
+                    short_jobs.append(job); short_audio.append(audio)
+                else:
+                    result = self.model.transcribe(audio, fp16=False, **job.options)
+                    job.reply = {"text": result["text"]}
+            except Exception as e:
+                job.reply = {"error": str(e)}
+
+        if short_jobs:
+            try:
+                self._decode_short(short_jobs, short_audio)
+            except Exception as e:
+                for job in short_jobs:
+                    job.reply = {"error": str(e)}
+
+        with self.stats_lock:
+            self.stats["batches"] += 1
+            self.stats["batched_clips"] += len(batch)
+            self.stats["errors"] += sum(1 for j in batch if "error" in (j.reply or {}))
+            self.stats["busy_seconds"] += time.perf_counter() - start
+            self.in_flight -= len(batch)
+        for job in batch:
+            job.done.set()
+
+    def _worker(self):
+        while True:
+            self._run_batch(self._next_batch())
+
+    # --- connections ---
+    def status(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = self.in_flight
+        stats["queue_depth"] = self.jobs.qsize()
+        stats["model"] = self.model_name
+        stats["avg_batch_size"] = round(stats["batched_clips"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _handle(self, conn):
+        try:
+            while True:
+                message = conn.recv()
+                op = message.get("op")
+                if op == "status":
+                    conn.send(self.status())
+                elif op == "transcribe":
+                    job = _Job(message["audio"], message.get("options") or {})
+                    with self.stats_lock:
+                        self.stats["requests"] += 1
+                        self.in_flight += 1
+                    self.jobs.put(job)
+                    job.done.wait()
+                    conn.send(job.reply)
+                else:
+                    conn.send({"error": f"Unknown op: {op}"})
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        if AUTHKEY is None:
+            raise SystemExit("❌ Set VERBAPOST_WHISPER_AUTHKEY to a secret shared with the web app.")
+        _secure_dir(os.path.dirname(self.socket_path))
+        threading.Thread(target=self._worker, daemon=True).start()
+        if os.path.lexists(self.socket_path):
+            os.remove(self.socket_path)
+        old_umask = os.umask(0o177)  # socket is created 0600
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=AUTHKEY)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        with listener:
+            print(f"🎧 Transcription service listening on {self.socket_path}")
+            try:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except Exception as e:
+                        print(f"❌ Rejected connection: {e}")
+                        continue
+                    threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+            finally:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+
+if __name__ == "__main__":
+    TranscriptionServer(sys.argv[1] if len(sys.argv) > 1 else MODEL_NAME).serve_forever()
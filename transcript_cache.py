@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- CONFIG ---
+MEMORY_ENTRIES = 256
+# Disk tier is off unless a directory is configured
+DISK_DIR = os.environ.get("VERBAPOST_TRANSCRIPT_CACHE_DIR")
+DISK_TTL = 7 * 24 * 3600  # seconds
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+def make_key(audio_fingerprint, model_name, language=None, **options):
+    """Audio fingerprint (see audio_processing.fingerprint) plus everything that changes Whisper's output."""
+    digest = hashlib.sha256(audio_fingerprint.encode("utf-8"))
+    extra = json.dumps({"model": model_name, "language": language, "options": options}, sort_keys=True)
+    digest.update(extra.encode("utf-8"))
+    return digest.hexdigest()
+
+def _disk_path(key):
+    return os.path.join(DISK_DIR, f"{key}.json")
+
+def _remember(key, text):
+    # caller holds _lock
+    _memory[key] = text
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+def get(key):
+    """Returns the cached transcript or None."""
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return _memory[key]
+
+    if DISK_DIR:
+        try:
+            with open(_disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["created"] <= DISK_TTL:
+                with _lock:
+                    _remember(key, entry["text"])
+                    _stats["disk_hits"] += 1
+                return entry["text"]
+            os.remove(_disk_path(key))
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def put(key, text):
+    with _lock:
+        _remember(key, text)
+
+    if DISK_DIR:
+        try:
+            os.makedirs(DISK_DIR, exist_ok=True)
+            tmp_path = f"{_disk_path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "created": time.time()}, f)
+            os.replace(tmp_path, _disk_path(key))
+        except OSError as e:
+            print(f"⚠️ Transcript cache write failed: {e}")
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    return stats
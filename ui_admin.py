@@ -1,9 +1,43 @@
 import streamlit as st
+import civic_engine
 import database
 import letter_format
+import mail_outbox
+import mailer
+import pdf_cache
+import prerender
+import transcribe_jobs
+import transcribe_service
 import os
+import json
+import shutil
+import tempfile
 import pandas as pd
 
+def _letter_addresses(l):
+    """(recipient, sender) address blocks as printed on the letter."""
+    s_name = l.author.address_name if l.author else "VerbaPost User"
+    s_addr = f"{l.author.address_street}\n{l.author.address_city}, {l.author.address_state}" if l.author else ""
+    s_str = f"{s_name}\n{s_addr}"
+    r_str = f"{l.recipient_name}\n{l.recipient_street}\n{l.recipient_city}, {l.recipient_state} {l.recipient_zip}"
+    return r_str, s_str
+
+def _letter_language(l):
+    """Letters are rendered in their author's saved language."""
+    return (l.author.language if l.author else None) or "English"
+
+def _print_rows(letters, printed_ids):
+    """Feeds streamed letters to the batch renderer, remembering which were included."""
+    for l in letters:
+        printed_ids.append(l.id)
+        r_str, s_str = _letter_addresses(l)
+        yield l.content or "", r_str, s_str, _letter_language(l), l.created_at
+
+def _discard_print_batch():
+    batch = st.session_state.pop("print_batch", None)
+    if batch:
+        shutil.rmtree(batch["dir"], ignore_errors=True)
+
 def show_admin():
     st.title("👮‍♂️ Admin Command")
     
@@ -24,9 +58,17 @@ def show_admin():
             st.rerun()
         st.stop()
 
-    # 3. Fetch Data
+    # 3. Fetch Data (one page at a time)
+    if "admin_cursors" not in st.session_state:
+        st.session_state.admin_cursors = [None]
+    cursor = st.session_state.admin_cursors[-1]
+
     try:
-        queue = database.get_admin_queue()
+        pending_count = database.get_queue_count()
+        queue, next_cursor = database.get_admin_queue_page(cursor)
+        failed = database.get_failed_mail()
+        printed_count = database.get_queue_count('Printed')
+        printed = database.get_admin_queue(limit=database.ADMIN_PAGE_SIZE, status='Printed')
     except Exception as e:
         st.error(f"Database Connection Error: {e}")
         return
@@ -34,49 +76,141 @@ def show_admin():
     # 4. Business Stats
     col1, col2, col3 = st.columns(3)
     
-    pending_count = len(queue)
     estimated_value = pending_count * 5.99 
     
     col1.metric("Pending Orders", pending_count, delta_color="inverse")
     col2.metric("Queue Value", f"${estimated_value:.2f}")
     col3.button("🔄 Refresh", on_click=st.rerun)
 
+    with st.expander("🩺 Diagnostics"):
+        pool_tab, mail_tab, civic_tab, fonts_tab, stt_tab = st.tabs(
+            ["🔌 DB Pool", "📮 Mail Outbox", "🏛️ Civic Lookups", "🔤 Fonts", "🎧 Transcription"]
+        )
+        with pool_tab:
+            st.json(database.get_pool_stats())
+        with mail_tab:
+            try:
+                st.json(mail_outbox.get_stats())
+            except Exception as e:
+                st.error(f"Database Connection Error: {e}")
+            st.caption("Address verification cache")
+            st.json(mailer.get_verify_stats())
+        with civic_tab:
+            st.json(civic_engine.get_stats())
+        with fonts_tab:
+            st.json(letter_format.preflight())
+            st.caption("PDF output (this server)")
+            st.json(letter_format.get_size_stats())
+            st.caption("Speculative renders during review")
+            st.json(prerender.get_stats())
+        with stt_tab:
+            st.caption("Background jobs (this server)")
+            st.json(transcribe_jobs.get_stats())
+            try:
+                st.json(transcribe_service.get_status())
+            except Exception as e:
+                st.caption(f"Not running ({e}). Workers load Whisper in-process.")
+
+    # Mail the outbox gave up on (e.g. Lob rejected the address): the customer was told it was queued
+    if failed:
+        with st.expander(f"⚠️ Failed Mail ({len(failed)})", expanded=True):
+            for item in failed:
+                to_name = json.loads(item.to_address).get('name', 'Unknown')
+                c1, c2 = st.columns([3, 1])
+                c1.markdown(f"**Order #{item.letter_id or '-'}** to {to_name} · {item.attempts} attempt(s)")
+                c1.caption(f"Lob: {item.last_error}")
+                if c2.button("🔁 Retry", key=f"retry_{item.id}"):
+                    mail_outbox.retry(item.id)
+                    st.toast(f"Retrying mail to {to_name}")
+                    st.rerun()
+
+    # Printed batches stay here until they are actually in the mail
+    with st.expander(f"📬 Printed, Awaiting Mailing ({printed_count})", expanded=printed_count > 0):
+        for l in printed:
+            c1, c2 = st.columns([3, 1])
+            c1.markdown(f"**#{l.id}** {l.recipient_name} · {l.recipient_city}, {l.recipient_state} {l.recipient_zip}")
+            if c2.button("✅ Mark Mailed", key=f"mailed_{l.id}"):
+                database.mark_batch_mailed([l.id])
+                st.toast(f"Order #{l.id} Archived!")
+                st.rerun()
+        if printed:
+            if printed_count > len(printed):
+                st.caption(f"Showing the newest {len(printed)} of {printed_count}.")
+            if st.button("✅ Mark All Shown Mailed", type="primary"):
+                updated = database.mark_batch_mailed([l.id for l in printed])
+                st.toast(f"{updated} orders archived!")
+                st.rerun()
+        else:
+            st.caption("Nothing waiting.")
+
     st.divider()
     st.subheader("🗂️ Fulfillment Queue")
 
     if not queue:
+        if cursor is not None:
+            # Page emptied out (e.g. last order on it was mailed) - go back
+            st.session_state.admin_cursors.pop()
+            st.rerun()
         st.success("🎉 All caught up! No pending orders.")
         st.balloons()
         return
 
+    # Pager
+    page_num = len(st.session_state.admin_cursors)
+    total_pages = max(1, -(-pending_count // database.ADMIN_PAGE_SIZE))
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("⬅️ Newer", disabled=page_num == 1):
+        st.session_state.admin_cursors.pop()
+        st.rerun()
+    p2.caption(f"Page {page_num} of {total_pages}")
+    if p3.button("Older ➡️", disabled=next_cursor is None):
+        st.session_state.admin_cursors.append(next_cursor)
+        st.rerun()
+
     # 5. The Work List
+    if "print_selection" not in st.session_state:
+        st.session_state.print_selection = set()
+    selection = st.session_state.print_selection
+    if "prepared_pdfs" not in st.session_state:
+        st.session_state.prepared_pdfs = set()
+    prepared = st.session_state.prepared_pdfs
+
     for l in queue:
         with st.container(border=True):
             c1, c2 = st.columns([3, 1])
             
             with c1:
+                if st.checkbox("Add to print batch", value=l.id in selection, key=f"sel_{l.id}"):
+                    selection.add(l.id)
+                else:
+                    selection.discard(l.id)
                 st.markdown(f"**To:** {l.recipient_name}")
                 st.caption(f"📍 {l.recipient_street}, {l.recipient_city}, {l.recipient_state} {l.recipient_zip}")
                 st.text(f"Message Preview: {l.content[:75]}...")
                 st.caption(f"Ordered: {l.created_at.strftime('%b %d, %I:%M %p')}")
 
             with c2:
-                # GENERATE PDF
-                s_name = l.author.address_name if l.author else "VerbaPost User"
-                s_addr = f"{l.author.address_street}\n{l.author.address_city}, {l.author.address_state}" if l.author else ""
-                
-                s_str = f"{s_name}\n{s_addr}"
-                r_str = f"{l.recipient_name}\n{l.recipient_street}\n{l.recipient_city}, {l.recipient_state} {l.recipient_zip}"
+                # PDF INPUTS
+                r_str, s_str = _letter_addresses(l)
                 
-                # Generate filename
-                pdf_path = letter_format.create_pdf(
-                    l.content, r_str, s_str, True, "English", f"order_{l.id}.pdf", None
+                # Render lazily: only letters the admin asked for touch the artifact cache.
+                # Dated by the order, so a cached PDF never carries a stale render date.
+                language = _letter_language(l)
+                cache_key = pdf_cache.cache_key(
+                    l.id, letter_format.TEMPLATE_VERSION, l.content, r_str, s_str, language, l.created_at.isoformat()
                 )
-                
-                with open(pdf_path, "rb") as f:
+                pdf_bytes = None
+                if l.id in prepared or st.button("📄 Prepare PDF", key=f"prep_{l.id}"):
+                    prepared.add(l.id)
+                    pdf_bytes = pdf_cache.get_or_render(cache_key, lambda: letter_format.create_pdf(
+                        l.content, r_str, s_str, True, language, f"order_{l.id}.pdf", None,
+                        as_bytes=True, date=l.created_at
+                    ))
+
+                if pdf_bytes is not None:
                     st.download_button(
                         "🖨️ Print PDF", 
-                        data=f, 
+                        data=pdf_bytes, 
                         file_name=f"VerbaPost_Order_{l.id}.pdf", 
                         mime="application/pdf",
                         key=f"dl_{l.id}"
@@ -87,3 +221,45 @@ def show_admin():
                     database.update_letter_status(l.id, "Sent")
                     st.toast(f"Order #{l.id} Archived!")
                     st.rerun()
+
+    # 6. Print Batch: merged PDFs in ZIP presort order, streamed to disk in fixed-size parts
+    st.divider()
+    st.subheader("🖨️ Print Batch")
+    scope = st.radio("Letters", ["Selected", "All queued"], horizontal=True)
+    batch_ids = sorted(selection) if scope == "Selected" else None
+    st.caption(f"{len(selection) if batch_ids is not None else pending_count} letter(s), sorted by recipient ZIP")
+
+    if st.button("📚 Build Print Batch", disabled=batch_ids is not None and not batch_ids):
+        _discard_print_batch()
+        printed_ids = []
+        batch_dir = tempfile.mkdtemp(prefix="verbapost_batch_")
+        with st.spinner("Rendering..."):
+            paths = letter_format.create_print_batches(
+                _print_rows(database.iter_print_batch(batch_ids), printed_ids), batch_dir
+            )
+        st.session_state.print_batch = {"dir": batch_dir, "paths": paths, "ids": printed_ids}
+
+    batch = st.session_state.get("print_batch")
+    if batch and batch["ids"]:
+        # Only the chosen part is read back for download
+        part = 0
+        if len(batch["paths"]) > 1:
+            part = st.selectbox(
+                f"Part ({letter_format.PRINT_CHUNK_LETTERS} letters each)",
+                range(len(batch["paths"])), format_func=lambda i: f"{i + 1} of {len(batch['paths'])}"
+            )
+        with open(batch["paths"][part], "rb") as f:
+            st.download_button(
+                f"🖨️ Download Batch ({len(batch['ids'])} letters)" if len(batch["paths"]) == 1
+                else f"🖨️ Download Part {part + 1}",
+                data=f,
+                file_name=f"VerbaPost_Print_Batch_{part + 1}.pdf" if len(batch["paths"]) > 1 else "VerbaPost_Print_Batch.pdf",
+                mime="application/pdf",
+                key="dl_batch"
+            )
+        if st.button("✅ Mark Batch Printed", type="primary"):
+            updated = database.mark_batch_printed(batch["ids"])
+            selection.difference_update(batch["ids"])
+            _discard_print_batch()
+            st.toast(f"{updated} orders marked printed!")
+            st.rerun()
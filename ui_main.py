@@ -1,13 +1,13 @@
 import streamlit as st
 from streamlit_drawable_canvas import st_canvas
-import os
-from PIL import Image
 from datetime import datetime
 import urllib.parse
 import io
 import zipfile
 import re
 import smtplib
+import time
+import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from supabase import create_client, Client # Added for Auth
@@ -37,7 +37,11 @@ def reset_app():
     st.session_state.transcribed_text = ""
     st.session_state.payment_complete = False
     st.session_state.stripe_url = None
-    st.session_state.sig_data = None
+    st.session_state.sig_png = None
+    st.session_state.transcribe_job = None
+    st.session_state.transcribe_audio_id = None
+    st.session_state.mail_session_id = None  # new letter, new idempotency keys
+    st.session_state.letter_id = None
     
     # Clear addresses (keep email/user)
     addr_keys = ["to_name", "to_street", "to_city", "to_state", "to_zip", 
@@ -48,6 +52,35 @@ def reset_app():
     st.query_params.clear()
     st.rerun()
 
+@st.fragment(run_every=1)
+def transcription_progress():
+    """Redraws only this status line each second; a finished job reruns the page to pick it up."""
+    import transcribe_jobs
+    job_id = st.session_state.get("transcribe_job")
+    job = transcribe_jobs.get(job_id) if job_id else None
+    if job is not None and job.pending:
+        st.info(f"⏳ Transcribing... ({job.elapsed:.0f}s)")
+    else:
+        st.rerun()
+
+def letter_pdf_job(content):
+    """(key, create_pdf args) for the current standard/heirloom letter; the key covers everything printed."""
+    import letter_format
+    import prerender
+    ss = st.session_state
+    args = (
+        content,
+        f"{ss.get('to_name', '')}\n{ss.get('to_street', '')}\n{ss.get('to_city', '')}, {ss.get('to_state', '')} {ss.get('to_zip', '')}",
+        f"{ss.get('from_name', '')}\n{ss.get('from_street', '')}\n{ss.get('from_city', '')}, {ss.get('from_state', '')} {ss.get('from_zip', '')}",
+        "Heirloom" in ss.get("locked_tier", "Standard"),
+        ss.get("selected_language", "English"),
+        "letter.pdf",
+        ss.get("sig_png"),
+        True,  # as_bytes
+    )
+    key = prerender.render_key(letter_format.TEMPLATE_VERSION, datetime.now().strftime("%Y-%m-%d"), *args)
+    return key, args
+
 def send_admin_alert(subject, body):
     """Sends an email notification to support@verbapost.com if secrets are configured."""
     email_secrets = st.secrets.get("email")
@@ -100,7 +133,6 @@ def render_password_reset_page():
                     st.query_params.clear()
                     
                     st.write("Redirecting to Workspace...")
-                    import time
                     time.sleep(2)
                     st.rerun()
                 except Exception as e:
@@ -110,10 +142,15 @@ def show_main_app():
     # -----------------------------------------------------------
     # LAZY IMPORTS 
     # -----------------------------------------------------------
-    import ai_engine 
+    import ai_engine
+    import audio_processing
+    import transcribe_jobs
     import database
     import letter_format
+    import prerender
+    import signature_image
     import mailer
+    import mail_outbox
     import zipcodes
     import payment_engine
     import civic_engine
@@ -142,7 +179,7 @@ def show_main_app():
         "processed_ids": [],
         "stripe_url": None,
         "locked_tier": "Standard",
-        "sig_data": None,
+        "sig_png": None,
         "selected_language": "English"
     }
     for k, v in defaults.items():
@@ -161,6 +198,8 @@ def show_main_app():
                 st.session_state.app_mode = "workspace"
                 if "tier" in qp: st.session_state.locked_tier = qp["tier"]
                 if "lang" in qp: st.session_state.selected_language = qp["lang"]
+                # The paid draft: the outbox records Sent / Mail Failed on it
+                if qp.get("letter_id", "").isdigit(): st.session_state.letter_id = int(qp["letter_id"])
                 
                 # Restore Addresses if present
                 keys_to_restore = ["to_name", "to_street", "to_city", "to_state", "to_zip", 
@@ -329,18 +368,33 @@ def show_main_app():
                 from_zip = c4.text_input("Your Zip", value=get_val("from_zip"))
             
             if st.form_submit_button("💾 Save Addresses"):
-                st.session_state.to_name = to_name; st.session_state.to_street = to_street
-                st.session_state.to_city = to_city; st.session_state.to_state = to_state
-                st.session_state.to_zip = to_zip; st.session_state.from_name = from_name
-                st.session_state.from_street = from_street; st.session_state.from_city = from_city
-                st.session_state.from_state = from_state; st.session_state.from_zip = from_zip
-                st.toast("Addresses Saved!")
+                # Reject undeliverable addresses now, before a paid render + upload
+                checks = [("from", mailer.verify_address({'name': from_name, 'street': from_street, 'city': from_city, 'state': from_state, 'zip': from_zip}))]
+                if not is_civic:
+                    checks.append(("to", mailer.verify_address({'name': to_name, 'street': to_street, 'city': to_city, 'state': to_state, 'zip': to_zip})))
+                bad = [side for side, check in checks if not check["ok"]]
+                if bad:
+                    for side in bad: st.error(f"❌ The {'recipient' if side == 'to' else 'sender'} address doesn't look deliverable. Please check it.")
+                else:
+                    st.session_state.to_name = to_name; st.session_state.to_street = to_street
+                    st.session_state.to_city = to_city; st.session_state.to_state = to_state
+                    st.session_state.to_zip = to_zip; st.session_state.from_name = from_name
+                    st.session_state.from_street = from_street; st.session_state.from_city = from_city
+                    st.session_state.from_state = from_state; st.session_state.from_zip = from_zip
+                    # Use the USPS-standardized form when Lob verified it
+                    for side, check in checks:
+                        if check["deliverability"] == "unverified": continue
+                        a = check["address"]
+                        st.session_state[f"{side}_street"] = a['address_line1']; st.session_state[f"{side}_city"] = a['address_city']
+                        st.session_state[f"{side}_state"] = a['address_state']; st.session_state[f"{side}_zip"] = a['address_zip']
+                    st.toast("Addresses Saved!")
 
         # Signature Canvas
         st.divider()
         st.subheader("2. Sign")
         canvas_result = st_canvas(fill_color="rgba(255, 165, 0, 0.3)", stroke_width=2, stroke_color="#000", background_color="#fff", height=200, width=350, drawing_mode="freedraw", key="sig")
-        if canvas_result.image_data is not None: st.session_state.sig_data = canvas_result.image_data
+        # Keep only the cropped 1-bit PNG (a few KB), not the raw 350x200 RGBA array
+        if canvas_result.image_data is not None: st.session_state.sig_png = signature_image.compact(canvas_result.image_data)
 
         # Dictation
         st.divider()
@@ -355,17 +409,35 @@ def show_main_app():
         if is_civic and not valid_sender: st.warning("⚠️ Please click **'Save Addresses'** first."); st.stop()
         if not is_civic and not (valid_recipient and valid_sender): st.warning("⚠️ Please click **'Save Addresses'** first."); st.stop()
 
-        if audio_val:
-            with st.status("Processing...", expanded=True):
-                path = "temp.wav"
-                with open(path, "wb") as f: f.write(audio_val.getvalue())
-                st.session_state.audio_path = path
-                try:
-                    text = ai_engine.transcribe_audio(path)
-                    st.session_state.transcribed_text = text
-                    st.session_state.app_mode = "review"
-                    st.rerun()
-                except Exception as e: st.error(f"Error: {e}")
+        # Transcription runs as a background job (per session: it doesn't survive a
+        # browser refresh); a self-refreshing fragment polls it until it is done
+        job_id = st.session_state.get("transcribe_job")
+        if job_id:
+            job = transcribe_jobs.get(job_id)
+            if job is None or not job.pending:
+                st.session_state.transcribe_job = None
+            if job is None:
+                st.warning("⚠️ Transcription expired. Please record again.")
+            elif job.status == "done":
+                # Drop "um"s and stutters before the user reviews the text
+                st.session_state.transcribed_text = ai_engine.polish_text(job.result, locked_lang)
+                st.session_state.app_mode = "review"
+                st.rerun()
+            elif job.status == "error":
+                st.error(f"Error: {job.error}")
+            else:
+                transcription_progress()
+
+        elif audio_val:
+            # The upload's own buffer (no copy): fingerprinted and decoded in memory
+            audio_bytes = audio_val.getvalue()
+            audio_id = audio_processing.fingerprint(audio_bytes)
+            # Don't resubmit the same clip after a failed job
+            if audio_id != st.session_state.get("transcribe_audio_id"):
+                st.session_state.transcribe_audio_id = audio_id
+                job_id = transcribe_jobs.submit(audio_bytes, audio_id, tier=locked_tier, language=locked_lang)
+                st.session_state.transcribe_job = job_id
+                st.rerun()
 
     # ==================================================
     #  PHASE 3: REVIEW
@@ -374,6 +446,11 @@ def show_main_app():
         st.header("4. Review")
         if not st.session_state.get("transcribed_text"): st.session_state.transcribed_text = ""
         edited = st.text_area("Edit:", value=st.session_state.transcribed_text, height=300)
+        # Render the PDF in the background once the text settles, so Finalize only waits on the mail API
+        if "Civic" not in st.session_state.get("locked_tier", "Standard"):
+            if "prerender_slot" not in st.session_state: st.session_state.prerender_slot = uuid.uuid4().hex
+            key, args = letter_pdf_job(edited)
+            prerender.schedule(st.session_state.prerender_slot, key, letter_format.create_pdf, *args)
         if st.button("🚀 Finalize & Send", type="primary"):
             st.session_state.transcribed_text = edited
             st.session_state.app_mode = "finalizing"
@@ -394,19 +471,26 @@ def show_main_app():
         fr_c = st.session_state.get("from_city", ""); fr_st = st.session_state.get("from_state", "")
         fr_z = st.session_state.get("from_zip", "")
         
-        sig_path = None
-        if st.session_state.get("sig_data") is not None:
-            try:
-                img = Image.fromarray(st.session_state.sig_data.astype('uint8'), 'RGBA')
-                sig_path = "temp_signature.png"
-                img.save(sig_path)
-            except: pass
+        sig_png = st.session_state.get("sig_png")
 
         with st.status("Sending...", expanded=True):
             today_str = datetime.now().strftime("%Y-%m-%d")
             safe_name = re.sub(r'[^a-zA-Z0-9]', '', to_n) or "Recipient"
             filename_pdf = f"VerbaPost_{safe_name}_{today_str}.pdf"
 
+            if not st.session_state.get("mail_session_id"): st.session_state.mail_session_id = uuid.uuid4().hex
+            letter_id = st.session_state.get("letter_id")
+            # Same letter + recipient -> same key, so reruns of this page never mail twice
+            def mail_key(addr_to):
+                return mail_outbox.idempotency_key(st.session_state.mail_session_id, letter_id, addr_to, st.session_state.transcribed_text)
+            mail_errors = []
+            def queue_mail(pdf, addr_to, addr_from):
+                # Durable hand-off: the outbox worker mails it (with retries)
+                try: mail_outbox.enqueue(pdf, addr_to, addr_from, mail_key(addr_to), letter_id)
+                except Exception as e:
+                    mail_errors.append(e)
+                    st.error(f"Mailer Error ({addr_to.get('name')}): {e}")
+
             if is_civic:
                 full_addr = f"{fr_s}, {fr_c}, {fr_st} {fr_z}"
                 try: targets = civic_engine.get_reps(full_addr)
@@ -414,33 +498,35 @@ def show_main_app():
                 if not targets: st.error("No Reps."); st.stop()
                 files = []
                 addr_from = {'name': fr_n, 'address_line1': fr_s, 'address_city': fr_c, 'address_state': fr_st, 'address_zip': fr_z}
-                for t in targets:
+                # Same letter to every rep: lay the body out once, stamp each address
+                pdfs = letter_format.create_pdf_batch(
+                    st.session_state.transcribed_text,
+                    [f"{t['name']}\n{t['address_obj']['street']}" for t in targets],
+                    f"{fr_n}\n{fr_s}...", locked_lang, sig_png
+                )
+                for t, pdf in zip(targets, pdfs):
                     t_addr = t['address_obj']
                     t_lob = {'name': t['name'], 'address_line1': t_addr['street'], 'address_city': t_addr['city'], 'address_state': t_addr['state'], 'address_zip': t_addr['zip']}
-                    pdf = letter_format.create_pdf(st.session_state.transcribed_text, f"{t['name']}\n{t_addr['street']}", f"{fr_n}\n{fr_s}...", False, locked_lang, f"{t['name']}.pdf", sig_path)
-                    files.append(pdf)
-                    mailer.send_letter(pdf, t_lob, addr_from)
+                    files.append((f"{t['name']}.pdf", pdf))
+                    queue_mail(pdf, t_lob, addr_from)
                 
                 zip_buffer = io.BytesIO()
                 with zipfile.ZipFile(zip_buffer, "w") as zf:
-                    for f in files: zf.write(f, os.path.basename(f))
+                    for name, data in files: zf.writestr(name, data)
                 st.download_button("📦 Download All", zip_buffer.getvalue(), f"VerbaPost_Civic_{today_str}.zip")
             
             else:
-                pdf = letter_format.create_pdf(
-                    st.session_state.transcribed_text, 
-                    f"{to_n}\n{to_s}\n{to_c}, {to_st} {to_z}", 
-                    f"{fr_n}\n{fr_s}\n{fr_c}, {fr_st} {fr_z}", 
-                    is_heirloom, locked_lang, filename_pdf, sig_path
-                )
+                # Usually already rendered during review
+                key, args = letter_pdf_job(st.session_state.transcribed_text)
+                pdf = prerender.take(key) or letter_format.create_pdf(*args)
                 
                 if not is_heirloom:
                      addr_to = {'name': to_n, 'address_line1': to_s, 'address_city': to_c, 'address_state': to_st, 'address_zip': to_z}
                      addr_from = {'name': fr_n, 'address_line1': fr_s, 'address_city': fr_c, 'address_state': fr_st, 'address_zip': fr_z}
-                     mailer.send_letter(pdf, addr_to, addr_from)
+                     queue_mail(pdf, addr_to, addr_from)
                 else:
-                     if "letter_id" in st.query_params:
-                         database.update_letter_status(st.query_params["letter_id"], "Queued", st.session_state.transcribed_text)
+                     if letter_id:
+                         database.update_letter_status(letter_id, "Queued", st.session_state.transcribed_text)
                      
                      # --- SEND HEIRLOOM ALERT ---
                      # Added email alert logic here as requested
@@ -456,12 +542,12 @@ Please log in to the admin console or check Supabase to fulfill this order.
                      """
                      send_admin_alert(alert_subject, alert_body)
 
-                with open(pdf, "rb") as f:
-                    st.download_button("Download Copy", f, filename_pdf)
+                st.download_button("Download Copy", pdf, filename_pdf, mime="application/pdf")
 
             st.write("✅ Done!")
             if st.session_state.get("user"):
                  database.update_user_profile(st.session_state.user.user.email, fr_n, fr_s, fr_c, fr_st, fr_z, locked_lang)
 
-        st.success("Sent!")
+        if mail_errors: st.warning("⚠️ Some letters could not be queued for mailing. Please try again or contact support.")
+        else: st.success("Sent! Your letter is queued for mailing.")
         if st.button("Start New"): reset_app()
\ No newline at end of file
@@ -4,6 +4,8 @@ import ui_splash
 import auth_engine 
 import payment_engine
 import database
+import letter_format
+import mail_outbox
 
 # 1. INTERCEPT STRIPE RETURN
 qp = st.query_params
@@ -39,6 +41,12 @@ def inject_custom_css():
         """, unsafe_allow_html=True)
 inject_custom_css()
 
+# 3b. STARTUP PREFLIGHT: validate bundled fonts and warm the font registry
+# once per process, so the first letter never waits on font loading
+letter_format.preflight()
+# Drain any mail left in the outbox by a previous process
+mail_outbox.start()
+
 # 4. HANDLERS
 def handle_login(email, password):
     user, error = auth_engine.sign_in(email, password)